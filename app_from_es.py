@@ -20,6 +20,7 @@ import csv
 import pandas as pd
 from elasticsearch import Elasticsearch
 import global_vars
+from pipeline import LAYOUT_PER_PAGE, page_counts, page_index_name
 import argparse
 import logging, multiprocessing
 
@@ -115,7 +116,11 @@ def get_es_data(es, index_name, state, counties):
     scroll_id = response['_scroll_id']
     hits = response['hits']['hits']
 
+    # per_page 布局下商家文档不再包含 pages, 页面数从页面索引聚合
+    per_page_layout = global_vars.config.get("ES_STORAGE_LAYOUT") == LAYOUT_PER_PAGE
+
     while len(hits) > 0:
+        batch_start = len(results)
         # 提取所需数据
         for hit in hits:
             source = hit["_source"]
@@ -135,6 +140,11 @@ def get_es_data(es, index_name, state, counties):
             }
             if True: # int(source["businessID"]) % 4 == 0:
                 results.append(result)
+        if per_page_layout:
+            batch = results[batch_start:]
+            counts = page_counts(es, page_index_name(index_name), [result["businessID"] for result in batch])
+            for result in batch:
+                result["pages_length"] = counts.get(result["businessID"], 0)
         global_vars.logger.error(f"长度 {len(results)}")
         try:
             response = es.scroll(scroll_id=scroll_id, scroll='1m', request_timeout=360)
@@ -247,7 +257,14 @@ async def main():
             timeout=10,
             batch_size=5,
             max_retries=3,
-            max_pages_per_website=500
+            max_pages_per_website=500,
+            profile_db_path=global_vars.config.get("DOMAIN_PROFILE_PATH", "data/domain_profiles.db"),
+            journal_path=global_vars.config.get("CRAWL_JOURNAL_PATH"),
+            validator_db_path=global_vars.config.get("PAGE_VALIDATOR_PATH", "data/page_validators.db"),
+            url_type_cache_path=global_vars.config.get("URL_TYPE_CACHE_PATH", "data/url_type_cache.db"),
+            document_extract_workers=int(global_vars.config.get("DOCUMENT_EXTRACT_WORKERS", "1")),
+            link_scorer=global_vars.config.get("LINK_SCORER", "keyword"),
+            async_pipeline=global_vars.config.get("ES_ASYNC_PIPELINE", "false").lower() == "true"
         )
         crawler.crawl_website(combined_data)
 
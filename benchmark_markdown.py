@@ -0,0 +1,72 @@
+import argparse
+import glob
+import os
+import statistics
+import time
+from difflib import SequenceMatcher
+from crawl4ai import DefaultMarkdownGenerator
+from markdown_converter import LxmlMarkdownConverter
+from page_transform import filter_html
+
+
+def similarity(a: str, b: str) -> float:
+    """Word-level similarity of two markdown outputs, 1.0 = same words in the same order"""
+    return SequenceMatcher(None, a.split(), b.split(), autojunk=False).ratio()
+
+
+def timed(convert, html: str, url: str, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        markdown = convert(html, url)
+    return markdown, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the lxml markdown converter with crawl4ai on saved pages.')
+    parser.add_argument('--Corpus', required=True, type=str, help='Directory of saved .html / .htm pages')
+    parser.add_argument('--Repeat', type=int, default=3, help='Conversions per page and converter')
+    parser.add_argument('--Domain', type=str, default='example.com', help='Domain used to resolve relative links')
+    parser.add_argument('--Verbose', action='store_true', help='Print every page')
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.Corpus, '**', '*.htm*'), recursive=True))
+    if not files:
+        print(f"No .html files in {args.Corpus}")
+        return
+
+    crawl4ai_generator = DefaultMarkdownGenerator()
+    lxml_converter = LxmlMarkdownConverter()
+    crawl4ai_convert = lambda html, url: crawl4ai_generator.generate_markdown(html, url).raw_markdown
+
+    crawl4ai_times, lxml_times, similarities = [], [], []
+    for path in files:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        url = f"http://{args.Domain}/{os.path.basename(path)}"
+        # The pipeline converts the cleaned body, so benchmark the same input
+        body = filter_html(html, args.Domain)[0]
+        if not body:
+            continue
+        reference, crawl4ai_time = timed(crawl4ai_convert, body, url, args.Repeat)
+        candidate, lxml_time = timed(lxml_converter.convert, body, url, args.Repeat)
+        crawl4ai_times.append(crawl4ai_time)
+        lxml_times.append(lxml_time)
+        similarities.append(similarity(reference, candidate))
+        if args.Verbose:
+            print(f"{path}: crawl4ai {crawl4ai_time * 1000:.1f} ms, lxml {lxml_time * 1000:.1f} ms, "
+                  f"similarity {similarities[-1]:.3f}")
+
+    if not similarities:
+        print("No page had a body to convert")
+        return
+    crawl4ai_total, lxml_total = sum(crawl4ai_times), sum(lxml_times)
+    print(f"Pages: {len(similarities)}")
+    print(f"crawl4ai: {len(crawl4ai_times) / crawl4ai_total:.1f} pages/s, median {statistics.median(crawl4ai_times) * 1000:.1f} ms")
+    print(f"lxml:     {len(lxml_times) / lxml_total:.1f} pages/s, median {statistics.median(lxml_times) * 1000:.1f} ms")
+    print(f"Speedup:  {crawl4ai_total / lxml_total:.1f}x")
+    print(f"Similarity: mean {statistics.mean(similarities):.3f}, median {statistics.median(similarities):.3f}, "
+          f"min {min(similarities):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+import global_vars
+
+
+class BrowserPool:
+    """One long-lived Chromium per process with a bounded pool of reusable pages.
+
+    Pages are spread over ``max_contexts`` browser contexts and are checked out with
+    ``async with pool.page() as page``. At most ``max_pages`` pages exist at any time,
+    so the pool doubles as the process-wide page budget. When the browser crashes or
+    disconnects, the next checkout drops its pages and relaunches it.
+    """
+
+    def __init__(self, max_pages: int = 10, max_contexts: int = 2, max_page_uses: int = 50,
+                 user_agent: str = None, headless: bool = True):
+        self.max_pages = max(1, max_pages)
+        self.max_contexts = max(1, min(max_contexts, self.max_pages))
+        self.max_page_uses = max_page_uses
+        self.user_agent = user_agent
+        self.headless = headless
+
+        self.playwright = None
+        self.browser = None
+        self.contexts = []
+        self._idle_pages = None  # asyncio.Queue of pages ready for reuse
+        self._slots = None  # asyncio.Semaphore bounding checked out + idle pages
+        self._page_uses = {}  # page -> number of times it has been checked out
+        self._next_context = 0
+        self._lock = None
+        self.restarts = 0
+
+    def _proc_name(self):
+        return f"proc-{os.getpid()}-{threading.current_thread().name}"
+
+    async def start(self):
+        """Launch Playwright, the browser and the contexts. Must run on the loop that will use the pool."""
+        if self.browser is not None:
+            return self
+        global_vars.logger.debug(f"Launching shared browser in process: {self._proc_name()}")
+        self._idle_pages = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_pages)
+        self._lock = asyncio.Lock()
+        self.playwright = await async_playwright().start()
+        await self._launch()
+        global_vars.logger.info(f"Shared browser started with {self.max_contexts} contexts / {self.max_pages} pages in process: {self._proc_name()}")
+        return self
+
+    async def _launch(self):
+        self.browser = await self.playwright.chromium.launch(headless=self.headless)
+        self.contexts = [await self._new_context() for _ in range(self.max_contexts)]
+
+    async def _ensure_browser(self):
+        """Relaunch the browser if it crashed or disconnected. Idle pages of the dead browser are
+        dropped; pages still checked out are no longer tracked and get discarded on release."""
+        if self.browser.is_connected():
+            return
+        async with self._lock:
+            if self.browser.is_connected():
+                return
+            global_vars.logger.warning(f"Shared browser disconnected, relaunching in process: {self._proc_name()}")
+            while not self._idle_pages.empty():
+                self._idle_pages.get_nowait()
+            self._page_uses.clear()
+            try:
+                await self.browser.close()
+            except Exception as e:
+                global_vars.logger.debug(f"Error closing disconnected browser: {e} in process: {self._proc_name()}")
+            await self._launch()
+            self.restarts += 1
+
+    async def _new_context(self):
+        return await self.browser.new_context(user_agent=self.user_agent, ignore_https_errors=True)
+
+    async def _new_page(self):
+        async with self._lock:
+            index = self._next_context % len(self.contexts)
+            self._next_context += 1
+            context = self.contexts[index]
+        page = await context.new_page()
+        self._page_uses[page] = 0
+        return page
+
+    async def _discard_page(self, page):
+        self._page_uses.pop(page, None)
+        try:
+            await page.close()
+        except Exception as e:
+            global_vars.logger.debug(f"Error closing page: {e} in process: {self._proc_name()}")
+
+    async def acquire(self):
+        """Check out a page, waiting for a free slot if the pool is exhausted."""
+        await self._slots.acquire()
+        try:
+            await self._ensure_browser()
+            while not self._idle_pages.empty():
+                page = self._idle_pages.get_nowait()
+                if not page.is_closed():
+                    break
+                await self._discard_page(page)
+            else:
+                page = await self._new_page()
+            self._page_uses[page] = self._page_uses.get(page, 0) + 1
+            return page
+        except Exception:
+            self._slots.release()
+            raise
+
+    async def release(self, page, reusable: bool = True):
+        """Return a page to the pool. Broken or worn out pages are closed instead of reused."""
+        try:
+            if (not reusable or page not in self._page_uses or page.is_closed()
+                    or self._page_uses.get(page, 0) >= self.max_page_uses):
+                await self._discard_page(page)
+            else:
+                self._idle_pages.put_nowait(page)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def page(self):
+        page = await self.acquire()
+        reusable = True
+        try:
+            yield page
+        except BaseException:
+            reusable = False
+            raise
+        finally:
+            await self.release(page, reusable)
+
+    async def close(self):
+        global_vars.logger.debug(f"Closing shared browser in process: {self._proc_name()}")
+        while self._idle_pages is not None and not self._idle_pages.empty():
+            await self._discard_page(self._idle_pages.get_nowait())
+        for context in self.contexts:
+            try:
+                await context.close()
+            except Exception as e:
+                global_vars.logger.debug(f"Error closing context: {e} in process: {self._proc_name()}")
+        self.contexts = []
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+        global_vars.logger.debug(f"Shared browser closed in process: {self._proc_name()}")
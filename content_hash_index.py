@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import global_vars
+from crawl_journal import to_signed
+from url_fingerprint import url_fingerprint
+
+
+class ContentHashIndex:
+    """url -> content_hash of the pages already stored in ES, per business.
+
+    The pipeline primes a business once with one ES fetch of its hashes and then drops pages whose
+    hash did not change before they reach the network. What ES answers is authoritative and replaces
+    the business's rows in the on-disk tier; the disk tier is only read when ES cannot be reached.
+    Rows are keyed by ``scope`` (index and storage layout), so switching ES_STORAGE_LAYOUT or the
+    index never reuses hashes of pages stored elsewhere. Only hashes of successful writes are
+    recorded. Only the ``max_businesses`` most recently used businesses are kept in memory.
+    """
+
+    def __init__(self, path: str = None, scope: str = '', max_businesses: int = 64):
+        self.path = path
+        self.scope = scope
+        self.max_businesses = max_businesses
+        self.hashes = OrderedDict()  # business_id -> {url fingerprint: content_hash}
+        self.skipped = 0
+        self.lock = threading.Lock()
+        self.conn = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(content_hashes)")]
+            if columns and 'scope' not in columns:
+                # 旧版本的表不知道哈希属于哪个索引 / 布局, 丢弃后从 ES 重新加载
+                self.conn.execute("DROP TABLE content_hashes")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS content_hashes (
+                    scope TEXT NOT NULL,
+                    business_id TEXT NOT NULL,
+                    fp INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (scope, business_id, fp)
+                )
+            """)
+            self.conn.commit()
+
+    def is_primed(self, business_id) -> bool:
+        with self.lock:
+            if str(business_id) in self.hashes:
+                self.hashes.move_to_end(str(business_id))
+                return True
+            return False
+
+    def _set(self, business_id: str, hashes: dict):
+        self.hashes[business_id] = hashes
+        self.hashes.move_to_end(business_id)
+        while len(self.hashes) > self.max_businesses:
+            self.hashes.popitem(last=False)
+
+    def load(self, business_id) -> bool:
+        """Prime a business from the on-disk tier when ES is unreachable; False if the disk knows nothing about it"""
+        if self.conn is None:
+            return False
+        business_id = str(business_id)
+        with self.lock:
+            rows = self.conn.execute("SELECT fp, content_hash FROM content_hashes WHERE scope = ? AND business_id = ?",
+                                     (self.scope, business_id)).fetchall()
+            if not rows:
+                return False
+            self._set(business_id, {fingerprint: content_hash for fingerprint, content_hash in rows})
+        return True
+
+    def prime(self, business_id, pages):
+        """Prime a business from (url, content_hash) pairs read from ES; they replace what the disk had"""
+        business_id = str(business_id)
+        hashes = {to_signed(url_fingerprint(url)): content_hash for url, content_hash in pages if url and content_hash}
+        with self.lock:
+            self._set(business_id, hashes)
+            if self.conn is not None:
+                try:
+                    self.conn.execute("DELETE FROM content_hashes WHERE scope = ? AND business_id = ?", (self.scope, business_id))
+                except Exception as e:
+                    global_vars.logger.error(f"Error clearing content hashes for business {business_id}: {e}")
+                self._save(business_id, hashes.items())
+
+    def unchanged(self, business_id, url: str, content_hash: str) -> bool:
+        with self.lock:
+            hashes = self.hashes.get(str(business_id))
+            if hashes is not None and hashes.get(to_signed(url_fingerprint(url))) == content_hash:
+                self.skipped += 1
+                return True
+        return False
+
+    def record(self, business_id, url: str, content_hash: str):
+        """Remember the hash of a page ES accepted"""
+        business_id = str(business_id)
+        fingerprint = to_signed(url_fingerprint(url))
+        with self.lock:
+            hashes = self.hashes.get(business_id)
+            if hashes is not None:
+                hashes[fingerprint] = content_hash
+            if self.conn is not None:
+                self._save(business_id, [(fingerprint, content_hash)])
+
+    def _save(self, business_id: str, rows):
+        try:
+            now = time.time()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO content_hashes (scope, business_id, fp, content_hash, updated) VALUES (?, ?, ?, ?, ?)",
+                [(self.scope, business_id, fingerprint, content_hash, now) for fingerprint, content_hash in rows])
+            self.conn.commit()
+        except Exception as e:
+            global_vars.logger.error(f"Error saving content hashes for business {business_id}: {e}")
+
+    def close(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import threading
+import time
+import global_vars
+from url_fingerprint import url_fingerprint
+
+SITE_STARTED = 'site_started'
+SITE_DONE = 'site_done'
+QUEUED = 'queued'
+DONE = 'done'
+
+
+def to_signed(fingerprint: int) -> int:
+    """SQLite integers are signed 64-bit, fingerprints are unsigned"""
+    return fingerprint - (1 << 64) if fingerprint >= (1 << 63) else fingerprint
+
+
+def to_unsigned(fingerprint: int) -> int:
+    return fingerprint + (1 << 64) if fingerprint < 0 else fingerprint
+
+
+class SiteState:
+    """What the journal knows about a website that was started in an earlier run"""
+
+    def __init__(self):
+        self.done = set()  # fingerprints of pages that were fully crawled
+        self.queued = {}  # fingerprint -> (url, depth) of everything put on the frontier
+
+    @property
+    def pending(self):
+        """(url, depth, fingerprint) of everything queued but never finished"""
+        return [(url, depth, fingerprint) for fingerprint, (url, depth) in self.queued.items() if fingerprint not in self.done]
+
+
+class CrawlJournal:
+    """Append-only on-disk log of crawl progress (SQLite in WAL mode) that lets a restarted run resume.
+
+    Every provider start/finish, frontier insert and finished page is appended as an event. Events
+    are buffered and committed in small batches, so a crash loses at most the last ``flush_interval``
+    seconds of progress; those pages are simply crawled again. The journal only describes the run in
+    progress: the crawler clears it once a run finishes cleanly, so a later run with the same file
+    starts over instead of skipping the providers the last run finished.
+    """
+
+    def __init__(self, path: str, flush_every: int = 200, flush_interval: float = 2.0):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.time()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                business_id TEXT NOT NULL,
+                event TEXT NOT NULL,
+                fp INTEGER,
+                url TEXT,
+                depth INTEGER,
+                ts REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS journal_business ON journal (business_id, event)")
+        self.conn.commit()
+
+    def _append(self, business_id, event, url=None, depth=None, fingerprint=None):
+        if fingerprint is None and url is not None:
+            fingerprint = url_fingerprint(url)
+        with self.lock:
+            self.buffer.append((str(business_id), event,
+                                to_signed(fingerprint) if fingerprint is not None else None,
+                                url, depth, time.time()))
+            should_flush = len(self.buffer) >= self.flush_every or time.time() - self.last_flush >= self.flush_interval
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.buffer:
+                return
+            rows, self.buffer = self.buffer, []
+            self.last_flush = time.time()
+            try:
+                self.conn.executemany(
+                    "INSERT INTO journal (business_id, event, fp, url, depth, ts) VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self.conn.commit()
+            except Exception as e:
+                global_vars.logger.error(f"Error writing {len(rows)} crawl journal events: {e}")
+
+    # 写入事件
+    def site_started(self, business_id):
+        self._append(business_id, SITE_STARTED)
+
+    def site_done(self, business_id):
+        self._append(business_id, SITE_DONE)
+        self.flush()
+
+    def queued(self, business_id, url: str, depth: int, fingerprint: int = None):
+        self._append(business_id, QUEUED, url, depth, fingerprint)
+
+    def page_done(self, business_id, url: str, fingerprint: int = None):
+        self._append(business_id, DONE, url, None, fingerprint)
+
+    # 恢复状态
+    def finished_sites(self) -> set:
+        rows = self.conn.execute("SELECT DISTINCT business_id FROM journal WHERE event = ?", (SITE_DONE,)).fetchall()
+        return {row[0] for row in rows}
+
+    def load_site(self, business_id):
+        """State of a website started in an earlier run, or None if it never started"""
+        business_id = str(business_id)
+        started = self.conn.execute("SELECT 1 FROM journal WHERE business_id = ? AND event = ? LIMIT 1",
+                                    (business_id, SITE_STARTED)).fetchone()
+        if not started:
+            return None
+        state = SiteState()
+        rows = self.conn.execute("SELECT event, fp, url, depth FROM journal WHERE business_id = ? AND event IN (?, ?) ORDER BY id",
+                                 (business_id, QUEUED, DONE))
+        for event, fingerprint, url, depth in rows:
+            fingerprint = to_unsigned(fingerprint)
+            if event == QUEUED:
+                state.queued.setdefault(fingerprint, (url, depth))
+            else:
+                state.done.add(fingerprint)
+        return state
+
+    def clear(self):
+        """Forget everything, called when the run the journal belongs to has finished"""
+        with self.lock:
+            self.buffer = []
+            try:
+                self.conn.execute("DELETE FROM journal")
+                self.conn.commit()
+            except Exception as e:
+                global_vars.logger.error(f"Error clearing crawl journal {self.path}: {e}")
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
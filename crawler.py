@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 import json
 import aiohttp
 from concurrent.futures import ThreadPoolExecutor
@@ -17,11 +18,12 @@ from link_extractor import LinkExtractor
 from url_type_checker import *
 from enum import Enum
 import queue
+import inspect
+import itertools
 import multiprocessing
 import os, re
 
-from scrapy import Request
-from scrapy.dupefilters import RFPDupeFilter
+from url_fingerprint import FingerprintSet, url_fingerprint
 
 from scrapy.http import TextResponse
 from scrapy.linkextractors.lxmlhtml import LxmlLinkExtractor
@@ -37,28 +39,83 @@ import threading
 import time
 import queue
 import global_vars
-from pipeline import CsvPipeline
+from pipeline import CsvPipeline, AsyncCsvPipeline
 from scrape_link_extractor import AsyncLinkExtractor
+from browser_pool import BrowserPool
+from http_fetcher import FetchTier, needs_javascript
+from domain_profile import DomainProfile, DomainProfileStore, profile_domain
+from wait_strategies import WAIT_STRATEGIES, WaitStrategy, build_wait_strategies
+from resource_policy import ResourcePolicy
+from rate_limiter import HostRateLimiter
+from crawl_journal import CrawlJournal
+from page_validators import NotModified, PageValidators, PageValidatorStore
+from url_type_cache import URLTypeCache
+from document_extractor import DocumentExtractor
+from parsed_page import PageLink, ParsedPage
+from link_scorer import LinkScorer, build_link_scorer
+
+HTTP_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36'
+# 每个网站处理文档队列的协程数; 文档不经过浏览器, 不占用页面并发
+DOCUMENT_WORKERS = 2
+# 待抓取队列中最多同时排队页面预算的几倍链接 (只计尚未抓取的); 按分数从高到低抓取, 预算用完后剩下的直接跳过
+FRONTIER_OVERSAMPLE = 3
 
 
 class Crawler:
     def __init__(
         self,
         max_processes: int = 4,
-        max_concurrent_per_thread: int = 10,
+        max_concurrent_per_thread: int = 10,  # Number of worker coroutines per website
         max_depth: int = 3,
         timeout: int = 30,
         batch_size: int = 5,
         max_retries: int = 3,
-        max_pages_per_website: int = 500  # New parameter
+        max_pages_per_website: int = 500,  # New parameter
+        max_concurrent_pages_per_website: int = None,  # Pages a website may render at once, defaults to max_concurrent_per_thread
+        max_pages_per_process: int = 10,  # Size of the shared browser's page pool
+        max_contexts_per_process: int = 2,
+        max_sites_per_process: int = 1,  # Websites crawled concurrently by each process
+        http_first: bool = True,  # Try a plain HTTP fetch before rendering with Playwright
+        profile_db_path: str = None,  # SQLite file of per-domain profiles learned across runs
+        wait_strategy: str = 'dom_stable',  # How a loaded page settles: 'load', 'networkidle' or 'dom_stable'
+        max_wait_seconds: float = 10,  # Hard cap on the settle wait
+        block_resources: bool = True,  # Abort heavy subresources and third-party trackers in Playwright
+        resource_policy_path: str = None,  # JSON ResourcePolicy overriding the built-in block lists
+        requests_per_host_per_second: float = 2.0,  # Default politeness rate, lowered on 429/503
+        journal_path: str = None,  # SQLite crawl journal; rerunning with the same file resumes the run
+        validator_db_path: str = None,  # SQLite store of ETag / Last-Modified per page for conditional recrawls
+        url_type_cache_path: str = None,  # SQLite tier of the URL type cache, shared across processes and runs
+        document_extract_workers: int = 1,  # Processes extracting PDF / DOCX text; 0 records documents by URL only
+        link_scorer: str = 'keyword',  # Frontier ranking, see link_scorer.LINK_SCORERS ('depth' = breadth-first)
+        async_pipeline: bool = False  # Write to ES with AsyncCsvPipeline on the crawl event loop
     ):
         self.max_processes = max_processes
         self.max_concurrent_per_thread = max_concurrent_per_thread
         self.max_depth = max_depth
         self.timeout = timeout
-        self.batch_size = batch_size
+        self.batch_size = batch_size  # Kept for callers; the frontier now schedules single URLs
+        self.max_concurrent_pages_per_website = max_concurrent_pages_per_website or max_concurrent_per_thread
         self.max_retries = max_retries
         self.max_pages_per_website = max_pages_per_website  # Set the limit
+        self.max_pages_per_process = max_pages_per_process
+        self.max_contexts_per_process = max_contexts_per_process
+        self.max_sites_per_process = max_sites_per_process
+        self.http_first = http_first
+        self.profile_db_path = profile_db_path
+        if wait_strategy not in WAIT_STRATEGIES:
+            raise ValueError(f"Unknown wait strategy {wait_strategy!r}, expected one of {tuple(WAIT_STRATEGIES)}")
+        self.wait_strategy = wait_strategy
+        self.max_wait_seconds = max_wait_seconds
+        self.block_resources = block_resources
+        self.resource_policy_path = resource_policy_path
+        self.requests_per_host_per_second = requests_per_host_per_second
+        self.journal_path = journal_path
+        self.validator_db_path = validator_db_path
+        self.url_type_cache_path = url_type_cache_path
+        self.document_extract_workers = document_extract_workers
+        self.link_scorer = link_scorer
+        build_link_scorer(link_scorer)  # Fail fast on an unknown scorer, before the worker processes start
+        self.async_pipeline = async_pipeline
 
         # Shared queue for start URLs
         self.start_providers_queue = multiprocessing.Queue()  # Changed to multiprocessing.Queue
@@ -70,17 +127,34 @@ class Crawler:
         self.user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36'
     #  Make the following functions static
     @staticmethod
-    async def init_process_resources():
-        """Initialize resources for each process"""
+    async def init_process_resources(max_pages_per_process: int = 10, max_contexts_per_process: int = 2,
+                                     wait_strategy: str = 'dom_stable', max_wait_seconds: float = 10,
+                                     block_resources: bool = True, resource_policy_path: str = None,
+                                     requests_per_host_per_second: float = 2.0):
+        """Initialize resources for each process: one shared browser with a page pool, the page wait
+        strategies, the resource blocking policy, the per-host rate limiter and one aiohttp session"""
         process_local = threading.local()
         user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36'
         global_vars.logger.debug(f"Initializing process resources in process: proc-{os.getpid()}-{threading.current_thread().name}")
-        if not hasattr(process_local, 'playwright'):
+        if not hasattr(process_local, 'browser_pool'):
             global_vars.logger.debug(f"Launching Playwright in process: proc-{os.getpid()}-{threading.current_thread().name}")
-            process_local.playwright = await async_playwright().start()
-            process_local.browser = await process_local.playwright.chromium.launch(headless=True)
-            process_local.context = await process_local.browser.new_context(user_agent=user_agent,ignore_https_errors=True)
+            process_local.browser_pool = BrowserPool(max_pages=max_pages_per_process,
+                                                     max_contexts=max_contexts_per_process,
+                                                     user_agent=user_agent)
+            await process_local.browser_pool.start()
             global_vars.logger.debug(f"Playwright launched successfully in process: proc-{os.getpid()}-{threading.current_thread().name}")
+
+        if not hasattr(process_local, 'wait_strategies'):
+            process_local.wait_strategies = build_wait_strategies(max_wait_seconds)
+            process_local.wait_strategy = wait_strategy
+
+        if not hasattr(process_local, 'resource_policy'):
+            process_local.resource_policy = None
+            if block_resources:
+                process_local.resource_policy = ResourcePolicy.from_file(resource_policy_path) if resource_policy_path else ResourcePolicy()
+
+        if not hasattr(process_local, 'rate_limiter'):
+            process_local.rate_limiter = HostRateLimiter(default_rate=requests_per_host_per_second)
         
         if not hasattr(process_local, 'session'):
             global_vars.logger.debug(f"Creating aiohttp session in process: proc-{os.getpid()}-{threading.current_thread().name}")
@@ -92,23 +166,34 @@ class Crawler:
     async def close_process_resources(process_local):
         """Close process resources"""
         global_vars.logger.debug(f"Closing process resources in process: proc-{os.getpid()}-{threading.current_thread().name}")
-        if hasattr(process_local, 'context'):
-            global_vars.logger.debug(f"Closing Playwright context in process: proc-{os.getpid()}-{threading.current_thread().name}")
-            await process_local.context.close()
-        if hasattr(process_local, 'browser'):
-            global_vars.logger.debug(f"Closing Playwright browser in process: proc-{os.getpid()}-{threading.current_thread().name}")
-            await process_local.browser.close()
-        if hasattr(process_local, 'playwright'):
-            global_vars.logger.debug(f"Stopping Playwright in process: proc-{os.getpid()}-{threading.current_thread().name}")
-            await process_local.playwright.stop()
+        if hasattr(process_local, 'browser_pool'):
+            global_vars.logger.debug(f"Closing shared browser in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            await process_local.browser_pool.close()
         if hasattr(process_local, 'session'):
             global_vars.logger.debug(f"Closing aiohttp session in process: proc-{os.getpid()}-{threading.current_thread().name}")
             await process_local.session.close()
+        if hasattr(process_local, 'wait_strategies'):
+            for name, strategy in process_local.wait_strategies.items():
+                if strategy.metrics.pages:
+                    global_vars.logger.info(f"Wait strategy '{name}': {strategy.metrics} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+        if hasattr(process_local, 'rate_limiter'):
+            global_vars.logger.info(f"Rate limiter: {process_local.rate_limiter.throttled_responses} throttled responses over {len(process_local.rate_limiter.buckets)} hosts in process: proc-{os.getpid()}-{threading.current_thread().name}")
+        if getattr(process_local, 'resource_policy', None) is not None:
+            global_vars.logger.info(f"Resource policy: {process_local.resource_policy.stats} in process: proc-{os.getpid()}-{threading.current_thread().name}")
         global_vars.logger.debug(f"process resources closed successfully in process: proc-{os.getpid()}-{threading.current_thread().name}")
 
     @staticmethod
-    async def fetch_with_playwright(url: str, process_local: threading.local, max_retries: int, timeout: int) -> str:
-        """Fetch page content with Playwright with retry mechanism"""
+    async def fetch_with_playwright(url: str, process_local: threading.local, max_retries: int, timeout: int,
+                                    wait_strategy: WaitStrategy = None, observed: DomainProfile = None,
+                                    rate_limited: bool = False) -> str:
+        """Fetch page content with Playwright with retry mechanism.
+
+        After 'load' the page is given to ``wait_strategy`` to settle; without one the load content is used.
+        Load / networkidle outcomes are recorded into ``observed`` when given.
+        Every load waits for the host's rate limiter before a page is checked out of the process-wide
+        pool, so a throttled host never holds pooled pages idle; ``rate_limited`` means the caller
+        already took the token of the first load.
+        """
         def get_encoding_from_playwright_response(pw_response):
             """
             Tries to extract the encoding from the Playwright Response's Content-Type header.
@@ -134,60 +219,70 @@ class Crawler:
             return encoding
 
 
-        async def request_handler(route):
-            resource_type = route.request.resource_type
-            if resource_type in ['image', 'media', 'font']:
-                global_vars.logger.debug(f"Skipping {resource_type} request: {route.request.url}")
-                await route.abort()
-            else:
-                await route.continue_()
-
         load_result = False  # Store load state result for logging as boolean
-        networkidle_result = False
+        aborted = False
         content = ""
         title = ""
         scrapy_like_response = None
         playwright_response = None
-        page = await process_local.context.new_page()
-
-        for attempt in range(max_retries):
-            try:
-                global_vars.logger.debug(f"Attempt {attempt + 1}/{max_retries} for {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-
-                # Attempt initial load if not already successful
-                if not load_result:
-                    try:                        
-                        # await page.route("**/*", request_handler)
-
-                        playwright_response = await page.goto(url, wait_until='load', timeout=timeout * 1000)
-
-                        load_result = True
-                        content = await page.content()  # Save content on successful load
-                        title = await page.title()
-                        global_vars.logger.debug(f"Initial 'load' success for {url}")
-                    except Exception as e:
-                        global_vars.logger.warning(f"Initial 'load' failed for {url}: {e}")
-                        continue
-
-                # Wait for networkidle
+        attempt = 0
+
+        while attempt < max_retries and not load_result and not aborted:
+            if attempt > 0 or not rate_limited:
+                await process_local.rate_limiter.acquire(url)
+            # Pages are checked out from the process-wide pool and returned afterwards instead of being closed
+            async with process_local.browser_pool.page() as page:
+                resource_policy = process_local.resource_policy
+                route_handlers = await resource_policy.install(page, url) if resource_policy else None
                 try:
-                    await page.wait_for_load_state('networkidle', timeout=timeout * 1000)
-
-                    networkidle_result = True
-                    content = await page.content()  # Overwrite with potentially updated content
-                    global_vars.logger.debug(f"Initial 'networkidle' success for {url}")
-                except Exception as e:
-                    global_vars.logger.warning(f"'networkidle' wait failed for {url}: {e}")
-                    break
+                    while attempt < max_retries:
+                        attempt += 1
+                        try:
+                            global_vars.logger.debug(f"Attempt {attempt}/{max_retries} for {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
 
-                global_vars.logger.debug(f"Playwright fetch time for {url} | Load: {load_result}, NetworkIdle: {networkidle_result} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-                break
+                            # Attempt initial load if not already successful
+                            if not load_result:
+                                try:
+                                    playwright_response = await page.goto(url, wait_until='load', timeout=timeout * 1000)
+                                    if playwright_response:
+                                        process_local.rate_limiter.report(url, playwright_response.status,
+                                                                          playwright_response.headers.get('retry-after'))
+
+                                    load_result = True
+                                    content = await page.content()  # Save content on successful load
+                                    title = await page.title()
+                                    global_vars.logger.debug(f"Initial 'load' success for {url}")
+                                except Exception as e:
+                                    global_vars.logger.warning(f"Initial 'load' failed for {url}: {e}")
+                                    break  # give the page back; the retry waits for the host without holding it
+                                finally:
+                                    if observed is not None:
+                                        observed.record_load(load_result)
+
+                            # Wait for the page to settle
+                            if wait_strategy is not None:
+                                settled = await wait_strategy.wait(page)
+                                if observed is not None and wait_strategy.name == 'networkidle':
+                                    observed.record_networkidle(settled)
+                                if settled or wait_strategy.content_on_timeout:
+                                    content = await page.content()  # Overwrite with potentially updated content
+                                if not settled:
+                                    global_vars.logger.warning(f"'{wait_strategy.name}' wait hit its cap for {url}")
+                                    break
+
+                            global_vars.logger.debug(f"Playwright fetch time for {url} | Load: {load_result}, Wait: {wait_strategy.name if wait_strategy else None} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                            break
 
-            except Exception as e:
-                global_vars.logger.warn(f"Failed fetching {url} (attempt {attempt + 1}): {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-                if "net::ERR_ABORTED" in str(e):
-                    global_vars.logger.error(f"Error fetching {url} (attempt {attempt + 1}): {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-                    break
+                        except Exception as e:
+                            global_vars.logger.warn(f"Failed fetching {url} (attempt {attempt}): {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                            if "net::ERR_ABORTED" in str(e):
+                                global_vars.logger.error(f"Error fetching {url} (attempt {attempt}): {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                                aborted = True
+                                break
+                finally:
+                    # Pooled pages are reused by other sites, so drop this site's routes
+                    if route_handlers:
+                        await resource_policy.uninstall(page, route_handlers)
 
         try:
             if playwright_response:
@@ -195,70 +290,349 @@ class Crawler:
                 scrapy_like_response = TextResponse(
                     url=playwright_response.url,
                     body=content, # Pass the string content
-                    encoding=page_encoding  # Inform Scrapy about the (likely) original encoding
+                    encoding=page_encoding,  # Inform Scrapy about the (likely) original encoding
+                    headers={name: playwright_response.headers[name] for name in ['etag', 'last-modified']
+                             if name in playwright_response.headers}
                 )
-
-            await page.close()
         except Exception as e:
-            global_vars.logger.error(f"Error fetching {url} (attempt {attempt + 1}): {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            global_vars.logger.error(f"Error fetching {url} (attempt {attempt}): {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
         
         return content, title, scrapy_like_response
 
+    @staticmethod
+    async def fetch_with_http(url: str, process_local: threading.local, timeout: int,
+                              max_body_size: int = 5 * 1024 * 1024, check_javascript: bool = True,
+                              validators: PageValidators = None, rate_limited: bool = False):
+        """Fetch a page with the pooled aiohttp session.
+
+        Returns (content, title, scrapy_like_response, escalate). ``escalate`` is True when the
+        page should be rendered by Playwright instead: request errors, error statuses, or HTML that
+        ``needs_javascript`` flags (only an empty body when ``check_javascript`` is off). Non-HTML responses come back with empty content and no
+        escalation, so the URL type checker can classify them. With ``validators`` the request is
+        conditional and NotModified is raised on a 304. ``rate_limited`` means the caller already
+        took the host's rate limiter token.
+        """
+        headers = {
+            'User-Agent': HTTP_USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            **(validators.conditional_headers() if validators else {}),
+        }
+        try:
+            if not rate_limited:
+                await process_local.rate_limiter.acquire(url)
+            async with process_local.session.get(url, headers=headers, allow_redirects=True, ssl=False,
+                                                 timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                process_local.rate_limiter.report(url, response.status, response.headers.get('Retry-After'))
+                if response.status == 304:
+                    raise NotModified(url)
+                if response.status >= 400:
+                    global_vars.logger.debug(f"HTTP tier got status {response.status} for {url}, escalating in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                    return "", "", None, True
+
+                content_type = response.headers.get('Content-Type', '')
+                if 'html' not in content_type.lower():
+                    global_vars.logger.debug(f"HTTP tier got non-HTML Content-Type '{content_type}' for {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                    return "", "", None, False
+
+                # content.read(n) only returns what is buffered so far; read to EOF, capped at max_body_size
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    body += chunk
+                    if len(body) >= max_body_size:
+                        del body[max_body_size:]
+                        break
+                body = bytes(body)
+                scrapy_like_response = TextResponse(
+                    url=str(response.url),
+                    body=body,
+                    headers={name: response.headers[name] for name in ['Content-Type', 'ETag', 'Last-Modified']
+                             if name in response.headers}
+                )
+        except NotModified:
+            raise
+        except Exception as e:
+            global_vars.logger.debug(f"HTTP tier failed for {url}: {e}, escalating in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            return "", "", None, True
+
+        if check_javascript:
+            reason = needs_javascript(scrapy_like_response)
+        else:
+            reason = '' if scrapy_like_response.text.strip() else 'empty body'
+        if reason:
+            global_vars.logger.debug(f"HTTP tier escalating {url} to Playwright: {reason} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            return "", "", None, True
+
+        title = scrapy_like_response.xpath('//title/text()').get() or ""
+        return scrapy_like_response.text, title.strip(), scrapy_like_response, False
+
+    @staticmethod
+    async def revalidate(url: str, process_local: threading.local, validators: PageValidators, timeout: int,
+                         rate_limited: bool = False) -> bool:
+        """Send a conditional request without reading the body; True if the page is unchanged (304)"""
+        headers = {'User-Agent': HTTP_USER_AGENT, **validators.conditional_headers()}
+        try:
+            if not rate_limited:
+                await process_local.rate_limiter.acquire(url)
+            async with process_local.session.get(url, headers=headers, allow_redirects=True, ssl=False,
+                                                 timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                process_local.rate_limiter.report(url, response.status, response.headers.get('Retry-After'))
+                return response.status == 304
+        except Exception as e:
+            global_vars.logger.debug(f"Conditional request failed for {url}: {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            return False
+
+    @staticmethod
+    async def fetch_page(url: str, process_local: threading.local, max_retries: int, timeout: int,
+                         http_first: bool = True, profile: DomainProfile = None, observed: DomainProfile = None,
+                         validators: PageValidators = None, page_slots: asyncio.Semaphore = None):
+        """Fetch a page with the cheapest tier that works.
+
+        ``profile`` is what earlier runs learned about the domain: static sites trust the HTTP tier,
+        sites that always needed rendering skip it, and domains where networkidle never fires use
+        the DOM stability wait instead. The outcome is recorded into ``observed``.
+        With ``validators`` from an earlier crawl the page is first revalidated; when the server
+        answers 304 nothing is fetched and the tier is FetchTier.NOT_MODIFIED.
+        Each request takes the host's rate limiter token first and only then one of ``page_slots``
+        (the site's fetch concurrency), so waiting on a throttled host holds neither.
+
+        Returns (content, title, scrapy_like_response, tier) where tier is the FetchTier that served it.
+        """
+        start_time = time.time()
+        content, title, scrapy_like_response, tier = "", "", None, None
+        rate_limiter = process_local.rate_limiter
+        slots = page_slots if page_slots is not None else contextlib.nullcontext()
+        if http_first and not (profile and profile.needs_browser()):
+            trust_static = bool(profile and profile.is_static())
+            await rate_limiter.acquire(url)
+            try:
+                async with slots:
+                    content, title, scrapy_like_response, escalate = await Crawler.fetch_with_http(url, process_local, timeout,
+                                                                                                    check_javascript=not trust_static,
+                                                                                                    validators=validators,
+                                                                                                    rate_limited=True)
+            except NotModified:
+                return "", "", None, FetchTier.NOT_MODIFIED
+            if not escalate:
+                tier = FetchTier.HTTP
+        elif validators is not None:
+            await rate_limiter.acquire(url)
+            async with slots:
+                not_modified = await Crawler.revalidate(url, process_local, validators, timeout, rate_limited=True)
+            if not_modified:
+                return "", "", None, FetchTier.NOT_MODIFIED
+
+        if tier is None:
+            wait_strategy_name = process_local.wait_strategy
+            if wait_strategy_name == 'networkidle' and profile and profile.skip_networkidle():
+                wait_strategy_name = 'dom_stable'
+            await rate_limiter.acquire(url)
+            async with slots:
+                content, title, scrapy_like_response = await Crawler.fetch_with_playwright(url, process_local, max_retries, timeout,
+                                                                                            process_local.wait_strategies[wait_strategy_name],
+                                                                                            observed, rate_limited=True)
+            tier = FetchTier.BROWSER
+
+        if observed is not None:
+            observed.record_page(tier.value, time.time() - start_time)
+        return content, title, scrapy_like_response, tier
+
     @staticmethod
     async def process_website(provider: Dict, 
                               pipeline: CsvPipeline, 
                               max_depth: int, 
                               max_pages_per_website: int, 
                               max_concurrent_per_thread: int,
-                                shutdown_event: multiprocessing.Event, batch_size: int, 
+                                max_concurrent_pages_per_website: int,
+                                shutdown_event: multiprocessing.Event,
                                 link_extractor: AsyncLinkExtractor, url_type_checker: URLTypeChecker,
-                                timeout: int, max_retries: int):
-        """Process a single website with its own queues and stats"""
+                                timeout: int, max_retries: int, process_local: threading.local,
+                                http_first: bool = True, profile_store: DomainProfileStore = None,
+                                journal: CrawlJournal = None, validator_store: PageValidatorStore = None,
+                                document_extractor: DocumentExtractor = None,
+                                link_scorer: LinkScorer = None):
+        """Process a single website on the current event loop.
+
+        URLs live in an asyncio.PriorityQueue frontier served by ``max_concurrent_per_thread`` worker
+        coroutines; a semaphore caps how many of them fetch a page at the same time. ``link_scorer``
+        ranks every link (depth, URL keywords, anchor text, position) and the best links are crawled
+        first, so ``max_pages_per_website`` is spent on the most useful pages; the frontier holds at
+        most FRONTIER_OVERSAMPLE times the budget of pending links. With
+        ``http_first`` pages are fetched over plain HTTP and only rendered by Playwright when needed.
+        When a ``profile_store`` is given, the domain's stored profile steers fetching and retries,
+        and what this crawl observed is merged back into it at the end. With a ``journal`` the
+        frontier and finished pages are logged to disk, and a site started by an interrupted run
+        resumes from its pending frontier instead of starting over. With a ``validator_store`` pages
+        whose ETag / Last-Modified still match are not re-rendered or re-sent to the pipeline; their
+        stored links keep feeding the frontier. Extracted links are classified first (extension,
+        document URL patterns, HEAD probe); PDF / DOCX links go to a document queue that never
+        touches the browser, the rest to the page frontier. With a ``document_extractor`` their
+        text is extracted in its process pool and becomes the document's content.
+        """
         start_url = provider["website"]
         website = urlparse(start_url).netloc
         business_id = provider["businessID"]
-        task_queue = queue.Queue()
-        visited_urls = set()
-        visited_urls_fp = set()
+        domain = profile_domain(start_url)
+        profile = profile_store.get(domain) if profile_store else None
+        observed = DomainProfile(domain)
+        if profile is not None:
+            max_retries = profile.suggested_retries(max_retries)
+            global_vars.logger.info(f"[{business_id}] Using stored {profile} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+        link_scorer = link_scorer or build_link_scorer()
+        # (-score, sequence, url, depth, fingerprint); the sequence keeps equal scores in FIFO order.
+        # A link is canonicalized and fingerprinted once, when it is found, and the fingerprint travels with it.
+        frontier = asyncio.PriorityQueue()
+        sequence = itertools.count()
+        frontier_limit = max_pages_per_website * FRONTIER_OVERSAMPLE
+        document_queue = asyncio.Queue()  # (url, URLType, depth, fingerprint) of links classified as documents
+        page_semaphore = asyncio.Semaphore(max_concurrent_pages_per_website)
+        start_fingerprint = url_fingerprint(start_url)
+        visited_urls = FingerprintSet()  # Pages fetched (and their redirect targets)
+        queued_urls = FingerprintSet()  # Everything ever put on the frontier
+        queued_urls.add_fingerprint(start_fingerprint)
         
         crawl_stats = {
             'start_time': time.time(),
             'total_urls': 1,
             'crawled_count': 0,
             'failed_urls': 0,
-            'all_urls': {start_url}
+            'fetch_tiers': {tier.value: 0 for tier in FetchTier}
         }
 
-        async def crawl_page(url: str, depth: int, process_local_thread):
+        def put_page(link: str, depth: int, fingerprint: int):
+            frontier.put_nowait((-link_scorer.score(link, depth), next(sequence), link, depth, fingerprint))
+
+        async def enqueue_links(links, url: str, depth: int, anchors: Dict[str, PageLink] = None):
+            """Queue the links of a page at ``depth`` that were never queued, within the frontier limit.
+            Documents go to the document queue, pages to the frontier, ranked with their ``anchors``
+            (anchor text and position on the page) when known."""
+            fingerprints = {link: url_fingerprint(link) for link in links}
+            unseen = [link for link, fingerprint in fingerprints.items() if fingerprint not in queued_urls]
+            pages, documents = await link_extractor.classify_links(unseen, url_type_checker)
+            anchors = anchors or {}
+            positions = {link: position for position, link in enumerate(links)}
+            scores = {link: link_scorer.score(link, depth + 1, anchors[link].text if link in anchors else '',
+                                              anchors[link].position if link in anchors else positions.get(link, 0))
+                      for link in pages}
+            # Only pending links count against the limit; when the frontier is nearly full the best
+            # links of the page get the remaining room
+            pages.sort(key=lambda link: scores[link], reverse=True)
+            new_links = []
+            for candidates, room in ((pages, frontier_limit - frontier.qsize()),
+                                     (list(documents), frontier_limit - document_queue.qsize())):
+                for link in candidates:
+                    if room <= 0:
+                        break
+                    # One fingerprint per link covers both visited pages and links already queued
+                    if queued_urls.add_fingerprint(fingerprints[link]):
+                        new_links.append(link)
+                        room -= 1
+            
+            crawl_stats['total_urls'] += len(new_links)
+
+            document_count = sum(1 for link in new_links if link in documents)
+            global_vars.logger.info(f"[{business_id}] Adding {len(new_links)} new links ({document_count} documents) to queue for {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            for link in new_links:
+                fingerprint = fingerprints[link]
+                if link in documents:
+                    document_queue.put_nowait((link, documents[link], depth + 1, fingerprint))
+                else:
+                    frontier.put_nowait((-scores[link], next(sequence), link, depth + 1, fingerprint))
+                if journal is not None:
+                    journal.queued(business_id, link, depth + 1, fingerprint)
+
+        async def send_item(url: str, content: str, html_info: URLInfo, depth: int, fetch_tier: FetchTier, fields: dict,
+                            on_stored=None):
+            """Build the pipeline item of a page or document and hand it to the pipeline.
+            ``on_stored`` is called by the pipeline once the page is in ES (or spooled to the dead letter file)."""
+            item = {
+                    'row': {
+                        'url': url,
+                        'content': content,
+                        'title': html_info.title,
+                        'processID': f"{os.getpid()}-{threading.current_thread().name}",
+                        'depth': depth,
+                        'url_type':  html_info.url_type,
+                        'fetch_tier': fetch_tier.value,
+                        **fields,
+                        **{k: provider[k] for k in ['state', 'county', 'googleReview', 
+                                            'googleReviewRating', 'googleReviewCount',
+                                            'domain', 'googleEntry', 'businessFullName', 'businessID', 'website'] if k in provider}
+                    }
+                }
+            if on_stored is not None:
+                item['on_stored'] = on_stored
+
+            # Call pipeline to save the item
+            try:
+                result = pipeline.process_item(item, None) # Use pipeline to save to ES.
+                if inspect.isawaitable(result):
+                    await result  # waits only while the pipeline's transform pool or write queue is full
+            except Exception as e:
+                global_vars.logger.error(f"[{business_id}] Error processing item for URL {url}: {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+
+        async def crawl_document(url: str, url_type: URLType, depth: int, fingerprint: int):
+            """Record a link classified as a document without fetching it as a page"""
+            if len(visited_urls) >= max_pages_per_website or shutdown_event.is_set():
+                return
+            if not visited_urls.add_fingerprint(fingerprint):
+                return
+            crawl_stats['fetch_tiers'][FetchTier.DOCUMENT.value] += 1
+            observed.record_url_type(url_type.name)
+            global_vars.logger.info(f"[{business_id}] Fetching {url_type} document URL: {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            text = ""
+            if document_extractor is not None:
+                text, final_url = await document_extractor.extract(url, url_type, process_local)
+                if final_url != url:
+                    final_fingerprint = url_fingerprint(final_url)
+                    visited_urls.add_fingerprint(final_fingerprint)
+                    queued_urls.add_fingerprint(final_fingerprint)
+            await send_item(url, text, URLInfo(url_type), depth, FetchTier.DOCUMENT, {})
+            crawl_stats['crawled_count'] += 1
+
+        async def crawl_page(url: str, depth: int, fingerprint: int):
             """Crawl a single page"""
             start_time = time.time()
             try:
-                url_fp = RFPDupeFilter().request_fingerprint(Request(url.strip('/')))
                 if depth > max_depth or len(visited_urls) >= max_pages_per_website or shutdown_event.is_set():
                     global_vars.logger.debug(f"[{business_id}] Reached max depth or max pages or shutdown signal. Skipping {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
                 
-                elif url in visited_urls or url_fp in visited_urls_fp:
+                elif not visited_urls.add_fingerprint(fingerprint):
                     global_vars.logger.debug(f"[{business_id}] Already visited {url}. Skipping in process: proc-{os.getpid()}-{threading.current_thread().name}")
 
                 else:
-                
-                    visited_urls.add(url)
-                    visited_urls_fp.add(url_fp)
-
                     should_crawl = True
                     html = None
                     scrapy_like_response = None
-                    html_info = URLInfo(url, URLType.HTML)
-
-                    global_vars.logger.debug(f"[{business_id}] Fetching {url} with Playwright in process: proc-{os.getpid()}-{threading.current_thread().name}")
-                    html, title, scrapy_like_response = await Crawler.fetch_with_playwright(url, process_local_thread, max_retries, timeout)
+                    parsed_page = None
+                    links = None
+                    on_stored = None
+                    html_info = URLInfo(URLType.HTML)
+                    validators = validator_store.get(url, fingerprint) if validator_store is not None else None
+
+                    global_vars.logger.debug(f"[{business_id}] Fetching {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                    html, title, scrapy_like_response, fetch_tier = await Crawler.fetch_page(url, process_local, max_retries, timeout, http_first,
+                                                                                                        profile, observed, validators, page_semaphore)
+                    crawl_stats['fetch_tiers'][fetch_tier.value] += 1
                     
-                    if not html:
+                    if fetch_tier == FetchTier.NOT_MODIFIED:
+                        # Unchanged since the last crawl: skip rendering, markdown and the ES update, but
+                        # keep walking the site through the links the page had last time
+                        should_crawl = False
+                        validator_store.touch(url, fingerprint)
+                        global_vars.logger.info(f"[{business_id}] Not modified since last crawl: {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                        if depth < max_depth:
+                            await enqueue_links(validators.links, url, depth)  # no anchor text stored, scored by URL
+                    elif not html:
                         html_info = await url_type_checker.is_pdf_url_with_title(url)
                         if html_info.url_type == URLType.PDF:
                             global_vars.logger.info(f"[{business_id}] Fetching pdf {html_info.url_type} URL: {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
                         elif html_info.url_type == URLType.DOCX:
                             global_vars.logger.info(f"[{business_id}] Fetching doc {html_info.url_type} URL: {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                        if html_info.url_type in (URLType.PDF, URLType.DOCX):
+                            # A document the link classifier could not see (start URL, resumed frontier): recorded
+                            # like a page, with its text when there is an extractor and by URL only otherwise
+                            if document_extractor is not None:
+                                html, _ = await document_extractor.extract(url, html_info.url_type, process_local)
                         elif html_info.url_type != URLType.HTML:
                             global_vars.logger.info(f"[{business_id}] Skipping {html_info.url_type} URL: {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
                             should_crawl = False
@@ -268,61 +642,49 @@ class Crawler:
                             global_vars.logger.info(f"[{business_id}] Failed parse URL: {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
                     else:
                         html_info.title = title
+                    if fetch_tier != FetchTier.NOT_MODIFIED:
+                        observed.record_url_type(html_info.url_type.name)
 
 
                     if should_crawl:
                         if scrapy_like_response is not None:
-                            response_url_fp = RFPDupeFilter().request_fingerprint(Request(scrapy_like_response.url.strip('/')))
-                            visited_urls.add(scrapy_like_response.url)
-                            visited_urls_fp.add(response_url_fp)
-
-                            if depth < max_depth and crawl_stats['crawled_count'] < max_pages_per_website:
+                            # One parse of the page serves link extraction and the pipeline's cleaning
+                            parsed_page = ParsedPage(scrapy_like_response, provider.get('domain', ''))
+                            if scrapy_like_response.url != url:
+                                final_fingerprint = url_fingerprint(scrapy_like_response.url)
+                                visited_urls.add_fingerprint(final_fingerprint)
+                                queued_urls.add_fingerprint(final_fingerprint)
+                                if journal is not None:
+                                    journal.page_done(business_id, scrapy_like_response.url, final_fingerprint)
+
+                            new_validators = None
+                            if validator_store is not None:
+                                new_validators = PageValidators.from_headers(url, scrapy_like_response.headers)
+
+                            follow_links = depth < max_depth and crawl_stats['crawled_count'] < max_pages_per_website
+                            # Validators keep the page's links even when they are not followed now: a later 304
+                            # may reach the page at a shallower depth and has to walk on through them
+                            if follow_links or new_validators is not None:
                                 global_vars.logger.debug(f"[{business_id}] Extracting links from {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
                                 try:
-                                    links = await link_extractor.extract_links(scrapy_like_response, url)
-                                    
-                                    new_links = []
-                                    for link in links: 
-                                        url_fp = RFPDupeFilter().request_fingerprint(Request(link.strip('/')))
-                                        if (link not in visited_urls and url_fp not in visited_urls_fp) and depth + 1 <= max_depth and crawl_stats['total_urls'] < max_pages_per_website:
-                                            new_links.append(link)
-                                    
-                                    crawl_stats['all_urls'].update(new_links)
-                                    crawl_stats['total_urls'] += len(new_links)
-
-                                    global_vars.logger.info(f"[{business_id}] Adding {len(new_links)} new links to queue for {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-                                    for i in range(0, len(new_links), batch_size):
-                                        batch = new_links[i:i + batch_size]
-                                        task_queue.put((batch, depth + 1))
-
-                                        global_vars.logger.debug(f"[{business_id}] Adding {batch} new links to queue for {url} as batch {i} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                                    links = await link_extractor.extract_links(parsed_page, url)
+                                    if follow_links:
+                                        await enqueue_links(links, url, depth,
+                                                            {urljoin(url, link.url): link for link in parsed_page.links})
                                 except Exception as e:
                                     global_vars.logger.error(f"[{business_id}] Error extracting or processing links from URL {url}: {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
 
-                            else:
-                                global_vars.logger.debug(f"[{business_id}] Max depth or max pages reached, not extracting links from {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-
-
-                        item = {
-                                'row': {
-                                    'url': scrapy_like_response.url if scrapy_like_response else url,
-                                    'content': html,
-                                    'title': html_info.title,
-                                    'processID': f"{os.getpid()}-{threading.current_thread().name}",
-                                    'depth': depth,
-                                    'url_type':  html_info.url_type,
-                                    **{k: provider[k] for k in ['state', 'county', 'googleReview', 
-                                                        'googleReviewRating', 'googleReviewCount',
-                                                        'domain', 'googleEntry', 'businessFullName', 'businessID', 'website'] if k in provider}
-                                }
-                            }
-
-                        # Call pipeline to save the item
-                        try:
-                            if item:
-                                pipeline.process_item(item, None) # Use pipeline to save to ES.
-                        except Exception as e:
-                            global_vars.logger.error(f"[{business_id}] Error processing item for URL {url}: {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                            if not follow_links:
+                                global_vars.logger.debug(f"[{business_id}] Max depth or max pages reached, not following links from {url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+
+                            if new_validators is not None and links is not None:
+                                new_validators.links = links
+                                # Saved only once the pipeline stored the page, so a failed write is not answered by a 304 next time
+                                on_stored = lambda: validator_store.save(new_validators, fingerprint)
+
+
+                        await send_item(scrapy_like_response.url if scrapy_like_response else url, html, html_info,
+                                        depth, fetch_tier, parsed_page.transform_fields() if parsed_page else {}, on_stored)
 
                             
                             
@@ -337,85 +699,85 @@ class Crawler:
             fetch_time = end_time - start_time
             global_vars.logger.info(f"[{business_id}] Crawling {url} at depth {depth} - {website} - Crawled: {crawl_stats['crawled_count']}/{crawl_stats['total_urls']} - Fetch Time: {fetch_time:.2f} seconds in process: proc-{os.getpid()}-{threading.current_thread().name}")
 
-        async def thread_worker(website, business_id):
-            """Worker that processes URLs from the queue"""
-            global_vars.logger.debug(f"[{business_id}] Thread worker started for {website} in thread: proc-{os.getpid()}-{threading.current_thread().name}")
-
-            process_local_thread = threading.local()
-            process_local_thread = await Crawler.init_process_resources()
-
-            attemps = 0
-            last_attempt_total_urls = 0
-
-            try:
-                while not shutdown_event.is_set():
-                    try:
-                        global_vars.logger.debug(f"[{business_id}] Thread is trying to get task: proc-{os.getpid()}-{threading.current_thread().name}")
-
-                        batch, depth = task_queue.get_nowait()
-                        global_vars.logger.debug(f"[{business_id}] Got batch of {len(batch)} URLs from queue at depth {depth} in thread: proc-{os.getpid()}-{threading.current_thread().name}")
-                        tasks = [crawl_page(url, depth, process_local_thread) for url in batch]
-                        global_vars.logger.debug(f"[{business_id}] Creating {len(tasks)} crawl tasks for batch in thread: proc-{os.getpid()}-{threading.current_thread().name}")
-                        await asyncio.gather(*tasks, return_exceptions=True)
-                        task_queue.task_done()
-                        global_vars.logger.debug(f"[{business_id}] Batch processing completed in thread: proc-{os.getpid()}-{threading.current_thread().name}")
-
-                        # After finishing a batch, check if we should exit
-                        if crawl_stats['crawled_count'] > 0 and (crawl_stats['crawled_count'] >= crawl_stats['total_urls'] or crawl_stats['crawled_count'] >= max_pages_per_website):
-                            global_vars.logger.info(f"[{business_id}] Crawled all URLs or reached max pages, exiting thread worker in thread: proc-{os.getpid()}-{threading.current_thread().name}")
-                            break
-
-                    except queue.Empty:
-                        # Check if we should exit when queue is empty
-                        if crawl_stats['crawled_count'] > 0 and (crawl_stats['crawled_count'] >= crawl_stats['total_urls'] or crawl_stats['crawled_count'] >= max_pages_per_website):
-                            global_vars.logger.info(f"[{business_id}] Attemp {attemps} / 3, {crawl_stats['crawled_count']} >= {crawl_stats['total_urls']}. attempt to exit thread worker in thread: proc-{os.getpid()}-{threading.current_thread().name}")
-                            attemps += 1
-                            if last_attempt_total_urls != crawl_stats['total_urls']:
-                                last_attempt_total_urls = crawl_stats['total_urls']
-                                attemps = 0
-
-                            if attemps >= 3:
-                                global_vars.logger.warn(f"[{business_id}] Crawled all URLs or reached max pages, exiting thread worker in thread: proc-{os.getpid()}-{threading.current_thread().name}")
-                                break
-
-                        global_vars.logger.debug(f"[{business_id}] Queue is empty, continuing in thread: proc-{os.getpid()}-{threading.current_thread().name} {crawl_stats['crawled_count']} / {crawl_stats['total_urls']}")
-                        await asyncio.sleep(1)  # Add small delay to prevent busy waiting
-                        continue
-
-            except Exception as e:
-                global_vars.logger.error(f"[{business_id}] Thread worker error for {website}: {e} in thread: proc-{os.getpid()}-{threading.current_thread().name}")
-
-            await Crawler.close_process_resources(process_local_thread)
-            global_vars.logger.debug(f"[{business_id}] Thread worker exited in thread: proc-{os.getpid()}-{threading.current_thread().name}")
-
-        # Start with initial URL
-        global_vars.logger.info(f"[{business_id}] Starting crawl for {start_url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-        task_queue.put(([start_url], 0))
-
+        async def site_worker(worker_id):
+            """Worker coroutine that crawls URLs from the frontier until it is cancelled"""
+            global_vars.logger.debug(f"[{business_id}] Worker {worker_id} started for {website} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            while True:
+                _, _, url, depth, fingerprint = await frontier.get()
+                try:
+                    # Links found on this page are queued before task_done, so frontier.join()
+                    # only returns once nothing is pending and nothing is in flight.
+                    await crawl_page(url, depth, fingerprint)
+                except Exception as e:
+                    global_vars.logger.error(f"[{business_id}] Worker {worker_id} error for {website}: {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                finally:
+                    if journal is not None:
+                        journal.page_done(business_id, url, fingerprint)
+                    frontier.task_done()
+
+        async def document_worker(worker_id):
+            """Worker coroutine that handles the document queue until it is cancelled"""
+            while True:
+                url, url_type, depth, fingerprint = await document_queue.get()
+                try:
+                    await crawl_document(url, url_type, depth, fingerprint)
+                except Exception as e:
+                    global_vars.logger.error(f"[{business_id}] Document worker {worker_id} error for {url}: {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                finally:
+                    if journal is not None:
+                        journal.page_done(business_id, url, fingerprint)
+                    document_queue.task_done()
+
+        async def drain():
+            # Pages queue documents before their task_done, so once the frontier is empty no new documents appear
+            await frontier.join()
+            await document_queue.join()
+
+        site_state = journal.load_site(business_id) if journal is not None else None
+        if site_state is not None:
+            # Resume an interrupted crawl: restore the dedup sets and requeue what was never finished
+            for fingerprint in site_state.done:
+                visited_urls.add_fingerprint(fingerprint)
+                queued_urls.add_fingerprint(fingerprint)
+            for fingerprint in site_state.queued:
+                queued_urls.add_fingerprint(fingerprint)
+            pending = site_state.pending
+            crawl_stats['total_urls'] = len(site_state.queued)
+            global_vars.logger.info(f"[{business_id}] Resuming crawl for {start_url} with {len(pending)} pending URLs, {len(site_state.done)} already done in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            for pending_url, pending_depth, pending_fingerprint in pending:
+                put_page(pending_url, pending_depth, pending_fingerprint)
+        else:
+            # Start with initial URL
+            global_vars.logger.info(f"[{business_id}] Starting crawl for {start_url} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            put_page(start_url, 0, start_fingerprint)
+            if journal is not None:
+                journal.site_started(business_id)
+                journal.queued(business_id, start_url, 0, start_fingerprint)
+
+        tasks = [asyncio.ensure_future(site_worker(i)) for i in range(max_concurrent_per_thread)]
+        tasks += [asyncio.ensure_future(document_worker(i)) for i in range(DOCUMENT_WORKERS)]
+
+        drained = False
+        try:
+            global_vars.logger.info(f"[{business_id}] Waiting for frontier to drain for {website} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            await asyncio.wait_for(drain(), timeout=timeout * 100)
+            drained = True
+        except asyncio.TimeoutError:
+            global_vars.logger.warn(f"[{business_id}] Timeout reached for website {website} in process: proc-{os.getpid()}-{threading.current_thread().name}")
         
-        # Create thread pool for this website
-        with ThreadPoolExecutor(max_workers=max_concurrent_per_thread) as executor:
-            loop = asyncio.get_event_loop()
-            tasks = []
-            
-            for _ in range(max_concurrent_per_thread):
-                task = loop.run_in_executor(
-                    executor,
-                    lambda: asyncio.new_event_loop().run_until_complete(thread_worker(website, business_id))
-                )
-                tasks.append(task)
-            
-            try:
-                global_vars.logger.info(f"[{business_id}] Waiting for thread workers to complete for {website} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-                await asyncio.wait_for(asyncio.gather(*tasks), timeout=timeout * 100)
-            except asyncio.TimeoutError:
-                global_vars.logger.warn(f"[{business_id}] Timeout reached for website {website} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-            
-            finally:
-                global_vars.logger.info(f"[{business_id}] Cancelling remaining tasks for {website} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-                for task in tasks:
-                    if not task.done():
-                        task.cancel()
+        finally:
+            global_vars.logger.info(f"[{business_id}] Stopping workers for {website} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if profile_store is not None:
+            profile_store.record(observed)
+        if journal is not None:
+            if drained and not shutdown_event.is_set():
+                journal.site_done(business_id)
+            else:
+                journal.flush()
 
         # Print stats for this website
         end_time = time.time()
@@ -424,50 +786,117 @@ class Crawler:
 
         global_vars.logger.info(f"""\n[{business_id}] Crawling statistics for {website}:"
         "  [{business_id}] Total time: {total_time:.2f} seconds"
-        "  [{business_id}] Total URLs crawled: {len(list(visited_urls))}"
+        "  [{business_id}] Total URLs crawled: {len(visited_urls)}"
         "  [{business_id}] Failed URLs: {crawl_stats['failed_urls']}"
+        "  [{business_id}] Fetch tiers: {crawl_stats['fetch_tiers']}"
         "  [{business_id}] Average time per page: {average_time:.2f} seconds""")
-        # with open("visited_urls.json", "w") as f:
-        #     f.write(json.dumps(list(visited_urls), indent=4))
 
     @staticmethod
     def website_worker(start_providers_queue: multiprocessing.Queue, shutdown_event: multiprocessing.Event,
                        max_depth: int, 
                        max_pages_per_website: int, 
                        max_concurrent_per_thread: int,
-                       batch_size: int, 
-                       timeout: int, max_retries: int):
-        """Worker that processes websites from the start_providers_queue"""
+                       max_concurrent_pages_per_website: int,
+                       timeout: int, max_retries: int,
+                       max_pages_per_process: int = 10,
+                       max_contexts_per_process: int = 2,
+                       max_sites_per_process: int = 1,
+                       http_first: bool = True,
+                       profile_db_path: str = None,
+                       wait_strategy: str = 'dom_stable',
+                       max_wait_seconds: float = 10,
+                       block_resources: bool = True,
+                       resource_policy_path: str = None,
+                       requests_per_host_per_second: float = 2.0,
+                       journal_path: str = None,
+                       validator_db_path: str = None,
+                       async_pipeline: bool = False,
+                       url_type_cache_path: str = None,
+                       document_extract_workers: int = 1,
+                       link_scorer: str = 'keyword'):
+        """Worker that processes websites from the start_providers_queue.
+
+        Up to ``max_sites_per_process`` websites are crawled at once on a single event loop. They
+        share the process browser, whose page pool is the global page budget, and each slot pulls
+        the next provider as soon as its current website finishes.
+        """
         # Initialize the pipeline here, so each website worker has its own instance
-        pipeline = CsvPipeline()
+        pipeline = AsyncCsvPipeline() if async_pipeline else CsvPipeline()
         link_extractor = AsyncLinkExtractor()
-        url_type_checker = URLTypeChecker()
+        profile_store = DomainProfileStore(profile_db_path) if profile_db_path else None
+        journal = CrawlJournal(journal_path) if journal_path else None
+        validator_store = PageValidatorStore(validator_db_path) if validator_db_path else None
+        document_extractor = DocumentExtractor(document_extract_workers, HTTP_USER_AGENT) if document_extract_workers > 0 else None
+        scorer = build_link_scorer(link_scorer)
 
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+
+        # One browser per process, shared by every provider this worker crawls
+        process_local = loop.run_until_complete(Crawler.init_process_resources(max_pages_per_process,
+                                                                               max_contexts_per_process,
+                                                                               wait_strategy, max_wait_seconds,
+                                                                               block_resources, resource_policy_path,
+                                                                               requests_per_host_per_second))
+        # One URL type cache per process: every site slot shares it, the SQLite tier is shared across processes
+        url_type_cache = URLTypeCache(path=url_type_cache_path)
+        url_type_checker = URLTypeChecker(rate_limiter=process_local.rate_limiter, session=process_local.session,
+                                          cache=url_type_cache)
         
-        global_vars.logger.info(f"Website worker started in process: proc-{os.getpid()}-{threading.current_thread().name}")
+        global_vars.logger.info(f"Website worker started with {max_sites_per_process} site slots in process: proc-{os.getpid()}-{threading.current_thread().name}")
 
-        while not shutdown_event.is_set():
-            try:
-                provider = start_providers_queue.get(timeout=1)  # Changed from get_nowait to get with timeout
-                global_vars.logger.info(f"[{provider['businessID']}] Got website {provider['website']} from queue in process (remaining providers: {start_providers_queue.qsize()} ): proc-{os.getpid()}-{threading.current_thread().name}")
-                loop.run_until_complete(Crawler.process_website(provider, pipeline, 
-                                                                max_depth, 
-                                                                max_pages_per_website,
-                                                                max_concurrent_per_thread,
-                                                                
-                                                        shutdown_event, batch_size, link_extractor, url_type_checker,
-                                                        timeout, max_retries))
-                start_providers_queue.task_done()
-                global_vars.logger.info(f"[{provider['businessID']}] Finished processing website {provider['website']} in process: proc-{os.getpid()}-{threading.current_thread().name}")
-            except queue.Empty:
-                global_vars.logger.info(f"Start URL queue is empty, exiting website worker in process: proc-{os.getpid()}-{threading.current_thread().name}")
-                break
-            except Exception as e:
-                global_vars.logger.error(f"Error in website worker: {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+        async def site_slot(slot_id):
+            """Crawl providers one after another until the start queue is empty"""
+            while not shutdown_event.is_set():
+                try:
+                    # The start queue is a Manager proxy, so block on it off the event loop
+                    provider = await loop.run_in_executor(None, lambda: start_providers_queue.get(timeout=1))
+                except queue.Empty:
+                    global_vars.logger.info(f"Start URL queue is empty, exiting site slot {slot_id} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                    break
+                except Exception as e:
+                    global_vars.logger.error(f"Error reading start URL queue in site slot {slot_id}: {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                    break
 
-        loop.close()
+                try:
+                    global_vars.logger.info(f"[{provider['businessID']}] Got website {provider['website']} from queue in slot {slot_id} (remaining providers: {start_providers_queue.qsize()} ): proc-{os.getpid()}-{threading.current_thread().name}")
+                    await Crawler.process_website(provider, pipeline, 
+                                                  max_depth, 
+                                                  max_pages_per_website,
+                                                  max_concurrent_per_thread,
+                                                  max_concurrent_pages_per_website,
+                                                  shutdown_event, link_extractor, url_type_checker,
+                                                  timeout, max_retries, process_local,
+                                                  http_first, profile_store, journal, validator_store,
+                                                  document_extractor, scorer)
+                    global_vars.logger.info(f"[{provider['businessID']}] Finished processing website {provider['website']} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                except Exception as e:
+                    global_vars.logger.error(f"Error in website worker: {e} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                finally:
+                    start_providers_queue.task_done()
+
+        async def run_site_slots():
+            await asyncio.gather(*(site_slot(i) for i in range(max(1, max_sites_per_process))))
+
+        try:
+            loop.run_until_complete(run_site_slots())
+        finally:
+            closing = pipeline.close_spider(None)
+            if inspect.isawaitable(closing):
+                loop.run_until_complete(closing)
+            loop.run_until_complete(Crawler.close_process_resources(process_local))
+            loop.close()
+            if profile_store is not None:
+                profile_store.close()
+            if journal is not None:
+                journal.close()
+            if validator_store is not None:
+                validator_store.close()
+            global_vars.logger.info(f"URL type cache: {url_type_cache.stats()} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+            url_type_cache.close()
+            if document_extractor is not None:
+                global_vars.logger.info(f"Document extraction: {document_extractor.stats} in process: proc-{os.getpid()}-{threading.current_thread().name}")
+                document_extractor.close()
 
     def crawl_website(self, start_providers: List[Dict]):
         """Main crawl method using multiprocessing.Process."""
@@ -480,6 +909,24 @@ class Crawler:
         start_providers_queue = manager.Queue() # Replace list with Queue
         shutdown_event = manager.Event()
 
+        # Skip providers an interrupted run with the same journal already finished
+        if self.journal_path:
+            journal = CrawlJournal(self.journal_path)
+            finished_sites = journal.finished_sites()
+            journal.close()
+            if finished_sites:
+                global_vars.logger.info(f"Crawl journal {self.journal_path}: skipping {len(finished_sites)} finished providers")
+                start_providers = [provider for provider in start_providers if str(provider['businessID']) not in finished_sites]
+
+        # Start the sites expected to take longest first so they don't straggle at the end of the run
+        if self.profile_db_path:
+            profile_store = DomainProfileStore(self.profile_db_path)
+            profiles = profile_store.get_many(profile_domain(provider['website']) for provider in start_providers)
+            profile_store.close()
+            start_providers = sorted(start_providers,
+                                     key=lambda provider: profiles[profile_domain(provider['website'])].expected_cost(),
+                                     reverse=True)
+
         # Add all start URLs to the queue
         for provider in start_providers:
             start_providers_queue.put(provider)
@@ -492,7 +939,14 @@ class Crawler:
                 target=Crawler.website_worker,
                 args=(start_providers_queue, shutdown_event, self.max_depth,
                       self.max_pages_per_website, self.max_concurrent_per_thread,
-                      self.batch_size, self.timeout, self.max_retries),
+                      self.max_concurrent_pages_per_website, self.timeout, self.max_retries,
+                      self.max_pages_per_process, self.max_contexts_per_process,
+                      self.max_sites_per_process, self.http_first, self.profile_db_path,
+                      self.wait_strategy, self.max_wait_seconds,
+                      self.block_resources, self.resource_policy_path,
+                      self.requests_per_host_per_second, self.journal_path,
+                      self.validator_db_path, self.async_pipeline, self.url_type_cache_path,
+                      self.document_extract_workers, self.link_scorer),
                 name=f"CrawlProcess-{i}"  # Naming processes helps with debugging
             )
             processes.append(p)
@@ -507,4 +961,11 @@ class Crawler:
             p.join()
 
         manager.shutdown()
+
+        # The run finished cleanly: the next run with this journal starts over instead of skipping every provider
+        if self.journal_path and all(p.exitcode == 0 for p in processes):
+            journal = CrawlJournal(self.journal_path)
+            journal.clear()
+            journal.close()
+            global_vars.logger.info(f"Crawl journal {self.journal_path} cleared after a complete run")
         global_vars.logger.info("Crawl process finished")
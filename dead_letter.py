@@ -0,0 +1,99 @@
+import glob
+import gzip
+import json
+import os
+import random
+import threading
+import time
+import global_vars
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Capped exponential backoff with full jitter for retry number ``attempt`` (starting at 1)"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """Stops calling ES after ``failure_threshold`` consecutive failed requests.
+
+    While open every call is refused; after ``reset_timeout`` seconds one trial request is let
+    through (half-open) and its outcome closes the breaker again or reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial_running and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                global_vars.logger.info("ES circuit breaker closed")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                global_vars.logger.warning(f"ES circuit breaker opened after {self.failures} failed requests, "
+                                           f"spooling documents for {self.reset_timeout:.0f}s")
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class DeadLetterSpool:
+    """Append-only spool of bulk actions ES could not take, as gzip-compressed JSONL.
+
+    Each process appends to its own file; every append is a separate gzip member, so a file cut
+    short by a crash still reads back up to the last complete batch. ``replay_dead_letters.py``
+    loads the spool back into ES.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"dead_letter-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl.gz")
+        self.spooled = 0
+        self.lock = threading.Lock()
+
+    def write(self, actions):
+        lines = ''.join(json.dumps(action, default=str, ensure_ascii=False) + '\n' for action in actions)
+        if not lines:
+            return
+        with self.lock:
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(lines)
+            self.spooled += len(actions)
+
+    @staticmethod
+    def files(directory: str):
+        return sorted(glob.glob(os.path.join(directory, 'dead_letter-*.jsonl.gz')))
+
+    @staticmethod
+    def read(path: str):
+        """Yield the actions of one spool file, stopping at a truncated tail"""
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except (EOFError, OSError, json.JSONDecodeError) as e:
+            global_vars.logger.warning(f"Dead letter file {path} is truncated, replaying what was complete: {e}")
@@ -0,0 +1,173 @@
+import asyncio
+import io
+import multiprocessing
+import re
+import signal
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import aiohttp
+from lxml import etree
+from pdfminer.high_level import extract_text
+import global_vars
+from url_type_checker import URLType
+
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+BLANK_LINES = re.compile(r'\n\s*\n\s*\n+')
+TRAILING_SPACES = re.compile(r'[ \t]+\n')
+# 解压后的 document.xml 上限, 防止 zip 炸弹
+MAX_DOCX_XML_BYTES = 50 * 1024 * 1024
+ZIP_SIGNATURE = b'PK\x03\x04'
+
+
+class DocumentTimeout(Exception):
+    """Text extraction of one document ran past its time limit"""
+
+
+def _alarm(signum, frame):
+    raise DocumentTimeout()
+
+
+def normalize_text(text: str) -> str:
+    text = text.replace('\x0c', '\n\n').replace('\r', '')  # pdfminer separates pages with form feeds
+    return BLANK_LINES.sub('\n\n', TRAILING_SPACES.sub('\n', text)).strip()
+
+
+def pdf_text(data: bytes, max_pages: int = 0) -> str:
+    return extract_text(io.BytesIO(data), maxpages=max_pages)
+
+
+def docx_text(data: bytes) -> str:
+    """Paragraph text of a .docx, read straight from word/document.xml"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        if archive.getinfo('word/document.xml').file_size > MAX_DOCX_XML_BYTES:
+            raise ValueError('word/document.xml too large')
+        xml = archive.read('word/document.xml')
+    root = etree.fromstring(xml, etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=True))
+    paragraphs = []
+    for paragraph in root.iter(f'{WORD_NAMESPACE}p'):
+        parts = []
+        for node in paragraph.iter(f'{WORD_NAMESPACE}t', f'{WORD_NAMESPACE}tab', f'{WORD_NAMESPACE}br'):
+            if node.tag == f'{WORD_NAMESPACE}t':
+                parts.append(node.text or '')
+            else:
+                parts.append('\t' if node.tag == f'{WORD_NAMESPACE}tab' else '\n')
+        paragraphs.append(''.join(parts))
+    return '\n\n'.join(paragraphs)
+
+
+def is_docx(data: bytes) -> bool:
+    """.docx is a zip archive; legacy binary .doc files (also routed here by extension) are not"""
+    return data[:4] == ZIP_SIGNATURE
+
+
+def extract_document(url_type_value: int, data: bytes, time_limit: float, max_pages: int = 0) -> str:
+    """Plain text of a PDF / DOCX. Runs in the DocumentExtractor workers; the time limit is
+    enforced inside the worker with SIGALRM, so a slow document does not take the worker down."""
+    use_alarm = time_limit and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _alarm)
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        if url_type_value == URLType.PDF.value:
+            text = pdf_text(data, max_pages)
+        else:
+            text = docx_text(data)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return normalize_text(text)
+
+
+class DocumentTooLarge(Exception):
+    """The document is bigger than DOCUMENT_MAX_BYTES"""
+
+
+class DocumentExtractor:
+    """Downloads PDF / DOCX documents and extracts their text in a process pool.
+
+    Downloads stream through the crawler's aiohttp session and stop at ``DOCUMENT_MAX_BYTES``;
+    extraction runs in ``workers`` spawned processes, so pdfminer never blocks the crawl event
+    loop, and each document gets ``DOCUMENT_TIMEOUT`` seconds (download and extraction each).
+    ``DOCUMENT_MAX_PAGES`` caps the PDF pages read (0 = all). Failures are logged and give an
+    empty text, so the document is still recorded by URL as before; so do legacy binary .doc files.
+    """
+
+    def __init__(self, workers: int = 1, user_agent: str = 'Mozilla/5.0'):
+        self.workers = max(1, workers)
+        self.user_agent = user_agent
+        self.max_bytes = int(global_vars.config.get("DOCUMENT_MAX_BYTES", 20 * 1024 * 1024))
+        self.timeout = float(global_vars.config.get("DOCUMENT_TIMEOUT", 60))
+        self.max_pages = int(global_vars.config.get("DOCUMENT_MAX_PAGES", 0))
+        self.logger = global_vars.logger
+        self.executor = self._create_executor()
+        # Only as many documents in the pool as it has workers, so the backstop timeout measures extraction, not queueing
+        self.slots = asyncio.Semaphore(self.workers)
+        self.stats = {'extracted': 0, 'too_large': 0, 'unsupported': 0, 'timeouts': 0, 'failed': 0}
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: the crawler process already runs threads
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    async def download(self, url: str, process_local) -> tuple:
+        """Stream a document into memory; returns (bytes, final url). Raises DocumentTooLarge."""
+        headers = {'User-Agent': self.user_agent,
+                   'Accept': 'application/pdf,application/vnd.openxmlformats-officedocument.wordprocessingml.document,*/*;q=0.8'}
+        await process_local.rate_limiter.acquire(url)
+        async with process_local.session.get(url, headers=headers, allow_redirects=True, ssl=False,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+            process_local.rate_limiter.report(url, response.status, response.headers.get('Retry-After'))
+            response.raise_for_status()
+            if response.content_length and response.content_length > self.max_bytes:
+                raise DocumentTooLarge(f"Content-Length {response.content_length}")
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                body += chunk
+                if len(body) > self.max_bytes:
+                    raise DocumentTooLarge(f"more than {self.max_bytes} bytes")
+            return bytes(body), str(response.url)
+
+    async def extract(self, url: str, url_type: URLType, process_local) -> tuple:
+        """Download and extract one document; returns (text, final url), text is empty on failure"""
+        try:
+            data, final_url = await self.download(url, process_local)
+        except DocumentTooLarge as e:
+            self.stats['too_large'] += 1
+            self.logger.info(f"Skipping text of {url}: {e}")
+            return "", url
+        except Exception as e:
+            self.stats['failed'] += 1
+            self.logger.error(f"Error downloading document {url}: {e}")
+            return "", url
+
+        if url_type == URLType.DOCX and not is_docx(data):
+            self.stats['unsupported'] += 1
+            self.logger.info(f"Skipping text of {url}: not a .docx (zip) file")
+            return "", final_url
+
+        loop = asyncio.get_running_loop()
+        try:
+            # The worker enforces the time limit itself; the outer wait is a backstop for a stuck worker
+            async with self.slots:
+                text = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, extract_document, url_type.value, data, self.timeout, self.max_pages),
+                    timeout=self.timeout + 30)
+        except (DocumentTimeout, asyncio.TimeoutError):
+            self.stats['timeouts'] += 1
+            self.logger.warning(f"Text extraction of {url} took longer than {self.timeout}s, skipped")
+            return "", final_url
+        except BrokenProcessPool:
+            self.stats['failed'] += 1
+            self.logger.error(f"Document worker died extracting {url}, restarting the pool")
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._create_executor()
+            return "", final_url
+        except Exception as e:
+            self.stats['failed'] += 1
+            self.logger.error(f"Error extracting text of {url}: {e!r}")
+            return "", final_url
+        self.stats['extracted'] += 1
+        return text, final_url
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
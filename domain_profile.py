@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+import global_vars
+
+
+def profile_domain(url: str) -> str:
+    """Key used for the profile store: the host without a leading www."""
+    domain = urlparse(url).netloc.lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain
+
+
+class DomainProfile:
+    """What we learned about one domain: how its pages had to be fetched and how they behaved.
+
+    Counters are additive so the profile of one crawl can be merged into the stored one.
+    """
+    MAX_LATENCY_SAMPLES = 50
+    MIN_PAGES = 10  # Pages needed before the profile is trusted to change fetching
+    MIN_WAITS = 5  # load / networkidle attempts needed before their rates are trusted
+
+    def __init__(self, domain: str, data: dict = None):
+        data = data or {}
+        self.domain = domain
+        self.crawls = data.get('crawls', 0)
+        self.pages = data.get('pages', 0)
+        self.http_pages = data.get('http_pages', 0)
+        self.browser_pages = data.get('browser_pages', 0)
+        self.load_attempts = data.get('load_attempts', 0)
+        self.load_successes = data.get('load_successes', 0)
+        self.networkidle_attempts = data.get('networkidle_attempts', 0)
+        self.networkidle_successes = data.get('networkidle_successes', 0)
+        self.latencies = list(data.get('latencies', []))
+        self.url_types = dict(data.get('url_types', {}))
+
+    def to_dict(self) -> dict:
+        return {
+            'crawls': self.crawls,
+            'pages': self.pages,
+            'http_pages': self.http_pages,
+            'browser_pages': self.browser_pages,
+            'load_attempts': self.load_attempts,
+            'load_successes': self.load_successes,
+            'networkidle_attempts': self.networkidle_attempts,
+            'networkidle_successes': self.networkidle_successes,
+            'latencies': self.latencies[-self.MAX_LATENCY_SAMPLES:],
+            'url_types': self.url_types,
+        }
+
+    # 记录本次爬取的观测值
+    def record_page(self, tier: str, latency: float):
+        self.pages += 1
+        if tier == 'http':
+            self.http_pages += 1
+        else:
+            self.browser_pages += 1
+        self.latencies.append(round(latency, 3))
+        del self.latencies[:-self.MAX_LATENCY_SAMPLES]
+
+    def record_load(self, success: bool):
+        self.load_attempts += 1
+        self.load_successes += int(success)
+
+    def record_networkidle(self, success: bool):
+        self.networkidle_attempts += 1
+        self.networkidle_successes += int(success)
+
+    def record_url_type(self, url_type: str):
+        self.url_types[url_type] = self.url_types.get(url_type, 0) + 1
+
+    def merge(self, other: 'DomainProfile'):
+        for field in ['crawls', 'pages', 'http_pages', 'browser_pages', 'load_attempts', 'load_successes',
+                      'networkidle_attempts', 'networkidle_successes']:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        self.latencies = (self.latencies + other.latencies)[-self.MAX_LATENCY_SAMPLES:]
+        for url_type, count in other.url_types.items():
+            self.url_types[url_type] = self.url_types.get(url_type, 0) + count
+
+    # 根据历史数据给出的建议
+    @property
+    def median_latency(self) -> float:
+        return statistics.median(self.latencies) if self.latencies else 0.0
+
+    @property
+    def render_needed_rate(self) -> float:
+        return self.browser_pages / self.pages if self.pages else 0.0
+
+    @property
+    def load_success_rate(self) -> float:
+        return self.load_successes / self.load_attempts if self.load_attempts else 1.0
+
+    @property
+    def networkidle_success_rate(self) -> float:
+        return self.networkidle_successes / self.networkidle_attempts if self.networkidle_attempts else 1.0
+
+    def is_static(self) -> bool:
+        """Pages were (almost) always served by the HTTP tier: skip the browser unless a fetch fails."""
+        return self.pages >= self.MIN_PAGES and self.render_needed_rate <= 0.05
+
+    def needs_browser(self) -> bool:
+        """Pages (almost) always needed rendering: don't bother with the HTTP tier."""
+        return self.pages >= self.MIN_PAGES and self.render_needed_rate >= 0.95
+
+    def skip_networkidle(self) -> bool:
+        """networkidle rarely fires on this domain, so waiting for it only burns the timeout."""
+        return self.networkidle_attempts >= self.MIN_WAITS and self.networkidle_success_rate < 0.2
+
+    def suggested_retries(self, max_retries: int) -> int:
+        """Retrying a domain whose pages rarely load just multiplies the timeout."""
+        if self.load_attempts >= self.MIN_WAITS and self.load_success_rate < 0.3:
+            return 1
+        return max_retries
+
+    def expected_cost(self) -> float:
+        """Rough crawl time of the domain in seconds, used to start big sites first."""
+        if not self.crawls:
+            return 0.0
+        return self.pages / self.crawls * self.median_latency
+
+    def __repr__(self):
+        return (f"DomainProfile(domain='{self.domain}', pages={self.pages}, render_needed={self.render_needed_rate:.2f}, "
+                f"networkidle={self.networkidle_success_rate:.2f}, median_latency={self.median_latency:.2f})")
+
+
+class DomainProfileStore:
+    """SQLite store of DomainProfile rows, shared by all crawler processes and kept across runs.
+
+    Open one store per process (SQLite connections must not cross a fork).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS domain_profiles (
+                domain TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def get(self, domain: str) -> DomainProfile:
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM domain_profiles WHERE domain = ?", (domain,)).fetchone()
+        return DomainProfile(domain, json.loads(row[0]) if row else None)
+
+    def get_many(self, domains) -> dict:
+        return {domain: self.get(domain) for domain in set(domains)}
+
+    def record(self, observed: DomainProfile):
+        """Merge the profile observed during one crawl into the stored profile."""
+        if not observed.pages and not observed.load_attempts:
+            return
+        observed.crawls += 1
+        with self.lock:
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                row = self.conn.execute("SELECT data FROM domain_profiles WHERE domain = ?", (observed.domain,)).fetchone()
+                profile = DomainProfile(observed.domain, json.loads(row[0]) if row else None)
+                profile.merge(observed)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO domain_profiles (domain, data, updated_at) VALUES (?, ?, ?)",
+                    (observed.domain, json.dumps(profile.to_dict()), time.time())
+                )
+                self.conn.execute("COMMIT")
+            except Exception as e:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                global_vars.logger.error(f"Error saving domain profile for {observed.domain}: {e}")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,51 @@
+import re
+from enum import Enum
+from scrapy.http import TextResponse
+
+
+class FetchTier(Enum):
+    HTTP = 'http'
+    BROWSER = 'browser'
+    NOT_MODIFIED = 'not_modified'  # Conditional request answered 304, nothing was fetched
+    DOCUMENT = 'document'  # Classified as a document from its link, never fetched as a page
+
+
+# 单页应用 (SPA) 的常见挂载点 / 框架标记
+SPA_MARKERS = [
+    re.compile(r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|___gatsby)["\'][^>]*>\s*</div>', re.I),
+    re.compile(r'<app-root[^>]*>\s*</app-root>', re.I),
+    re.compile(r'data-reactroot|ng-version=|data-server-rendered', re.I),
+]
+NOSCRIPT_SHELL = re.compile(r'<noscript[^>]*>[^<]*(?:enable|requires?)\s+javascript', re.I)
+SCRIPT_OR_STYLE = re.compile(r'<(script|style|noscript|template)\b[^>]*>.*?</\1\s*>', re.I | re.S)
+TAG = re.compile(r'<[^>]+>')
+WHITESPACE = re.compile(r'\s+')
+
+
+def visible_text_length(html: str) -> int:
+    """Cheap estimate of how much readable text an HTML document carries"""
+    text = TAG.sub(' ', SCRIPT_OR_STYLE.sub(' ', html))
+    return len(WHITESPACE.sub(' ', text).strip())
+
+
+def needs_javascript(response: TextResponse, min_text_length: int = 200, min_links: int = 3) -> str:
+    """Decide whether a page fetched over plain HTTP must be re-rendered in the browser.
+
+    Returns the reason as a short string, or an empty string when the static HTML is good enough.
+    """
+    html = response.text
+    if not html or not html.strip():
+        return 'empty body'
+
+    text_length = visible_text_length(html)
+    if NOSCRIPT_SHELL.search(html) and text_length < min_text_length * 5:
+        return 'noscript shell'
+    if text_length < min_text_length:
+        if any(marker.search(html) for marker in SPA_MARKERS):
+            return 'spa shell'
+        return 'too little text'
+
+    link_count = len(response.xpath('//a[@href]'))
+    if link_count < min_links:
+        return f'too few links ({link_count})'
+    return ''
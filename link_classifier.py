@@ -0,0 +1,119 @@
+import asyncio
+import posixpath
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+from url_type_checker import URLType, URLTypeChecker
+
+# 按扩展名直接判断为文档
+DOCUMENT_EXTENSIONS = {'.pdf': URLType.PDF, '.docx': URLType.DOCX, '.doc': URLType.DOCX}
+# 明确是网页的扩展名, 不需要探测
+PAGE_EXTENSIONS = {'', '.html', '.htm', '.shtml', '.xhtml', '.php', '.asp', '.aspx', '.jsp', '.cfm', '.cgi', '.pl'}
+# 静态网页扩展名: 即使路径像下载链接 (/uploads/.../x.html) 也不探测
+STATIC_PAGE_EXTENSIONS = {'.html', '.htm', '.shtml', '.xhtml'}
+# 没有扩展名的文档下载地址 (CivicPlus 等市政网站常用)
+DOCUMENT_PATTERNS = [
+    re.compile(r'/DocumentCenter/View/', re.I),
+    re.compile(r'/AgendaCenter/ViewFile/', re.I),
+    re.compile(r'/ArchiveCenter/ViewFile/', re.I),
+    re.compile(r'/Archive\.aspx\?ADID=', re.I),
+    re.compile(r'/showpublisheddocument/', re.I),
+]
+# 看起来像下载链接, 类型不确定, 需要 HEAD 探测
+PROBE_HINT = re.compile(r'download|attachment|getfile|viewfile|/files?/|/uploads?/|/media/', re.I)
+
+
+def is_document_pattern(url: str) -> bool:
+    return any(pattern.search(url) for pattern in DOCUMENT_PATTERNS)
+
+
+def extension_type(url: str) -> Optional[URLType]:
+    """Type of a link from its extension and known document URL patterns alone.
+
+    Returns PDF / DOCX for documents, HTML for links that are plainly pages, and None when the
+    link is ambiguous and has to be probed.
+    """
+    parsed = urlparse(url)
+    extension = posixpath.splitext(parsed.path)[1].lower()
+    if extension in DOCUMENT_EXTENSIONS:
+        return DOCUMENT_EXTENSIONS[extension]
+    if is_document_pattern(url):
+        return None
+    if extension in STATIC_PAGE_EXTENSIONS or (extension in PAGE_EXTENSIONS and not PROBE_HINT.search(url)):
+        return URLType.HTML
+    return None
+
+
+class LinkClassifier:
+    """Splits the links of a page into pages (for the fetch frontier) and documents.
+
+    Extensions and known document URL patterns decide most links for free. The rest are probed
+    with concurrent HEAD requests through the URLTypeChecker, at most ``max_probes`` per page and
+    ``max_concurrent_probes`` at a time. Probes go through the host's rate limiter, so they only
+    use tokens the host has to spare right now (keeping one for the next page fetch) and never
+    make a page wait for its links to be queued. Links matching a document pattern count as PDFs
+    when they are not probed or the probe fails; other unresolved links stay pages, as before
+    classification existed.
+    """
+
+    def __init__(self, max_probes: int = 4, max_concurrent_probes: int = 4):
+        self.max_probes = max_probes
+        self.max_concurrent_probes = max_concurrent_probes
+
+    async def probe(self, urls: List[str], url_type_checker: URLTypeChecker) -> Dict[str, URLType]:
+        semaphore = asyncio.Semaphore(self.max_concurrent_probes)
+
+        async def probe_one(url):
+            async with semaphore:
+                info = await url_type_checker.is_pdf_url_with_title(url, max_retries=2, with_title=False)
+                return url, info.url_type
+
+        return dict(await asyncio.gather(*(probe_one(url) for url in urls)))
+
+    def probe_allowance(self, urls: List[str], url_type_checker: URLTypeChecker) -> List[str]:
+        """The links to probe: at most ``max_probes``, and per host only its spare rate limiter tokens"""
+        rate_limiter = url_type_checker.rate_limiter
+        if rate_limiter is None:
+            return urls[:self.max_probes]
+        spare = {}
+        selected = []
+        for url in urls:
+            if len(selected) >= self.max_probes:
+                break
+            host = rate_limiter.host_of(url)
+            if host not in spare:
+                spare[host] = rate_limiter.available(url) - 1
+            if spare[host] > 0:
+                spare[host] -= 1
+                selected.append(url)
+        return selected
+
+    async def classify(self, urls: Iterable[str], url_type_checker: URLTypeChecker = None) -> Tuple[List[str], Dict[str, URLType]]:
+        """Returns (page urls, {document url: URLType.PDF / URLType.DOCX}); links probed as other
+        content (images, archives, ...) are dropped"""
+        pages, documents, ambiguous = [], {}, []
+        for url in urls:
+            url_type = extension_type(url)
+            if url_type == URLType.HTML:
+                pages.append(url)
+            elif url_type is not None:
+                documents[url] = url_type
+            else:
+                ambiguous.append(url)
+
+        probed = {}
+        if url_type_checker is not None and ambiguous:
+            # Links without a document pattern first: the pattern ones have a good fallback
+            ambiguous.sort(key=is_document_pattern)
+            probed = await self.probe(self.probe_allowance(ambiguous, url_type_checker), url_type_checker)
+        for url in ambiguous:
+            url_type = probed.get(url, URLType.ERROR)
+            if url_type in (URLType.PDF, URLType.DOCX):
+                documents[url] = url_type
+            elif url_type == URLType.OTHER:
+                continue
+            elif url_type == URLType.ERROR and is_document_pattern(url):
+                documents[url] = URLType.PDF
+            else:
+                pages.append(url)
+        return pages, documents
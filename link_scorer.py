@@ -0,0 +1,87 @@
+import re
+from urllib.parse import urlparse
+
+# 路径 / 锚文本中出现这些词的页面优先抓取 (整词匹配, 也匹配复数和 -ing 形式: program 匹配 programs,
+# 但 fee 不匹配 feel / feedback)
+DEFAULT_KEYWORDS = {
+    'program': 3.0, 'programme': 3.0, 'camp': 3.0, 'schedule': 2.5, 'pricing': 2.5, 'price': 2.0, 'tuition': 2.5,
+    'fee': 2.0, 'rates': 1.5, 'class': 2.0, 'course': 2.0, 'lesson': 2.0, 'registration': 2.0, 'register': 2.0,
+    'enroll': 2.0, 'enrollment': 2.0, 'enrolment': 2.0, 'summer': 1.5, 'session': 1.0, 'activity': 1.5,
+    'about': 1.0, 'contact': 1.0, 'location': 1.0, 'hour': 1.0, 'faq': 1.0,
+}
+# 几乎没有可索引内容的页面
+DEFAULT_PENALTIES = {
+    'login': -3.0, 'signin': -3.0, 'logout': -3.0, 'account': -2.0, 'cart': -3.0, 'checkout': -3.0,
+    'privacy': -2.0, 'terms': -2.0, 'cookie': -2.0, 'career': -1.5, 'job': -1.5, 'blog': -1.0, 'news': -1.0,
+    'tag': -1.5, 'author': -1.5, 'feed': -2.0, 'share': -2.0, 'print': -2.0, 'search': -1.5, 'archive': -1.0,
+}
+WORD = re.compile(r'[a-z]+')
+
+
+def word_forms(word: str) -> set:
+    """The word with its plural and -ing forms (camp: camps, camping; activity: activities; schedule: scheduling)"""
+    forms = {word, word + 's', word + 'es', word + 'ing'}
+    if word.endswith('e'):
+        forms.add(word[:-1] + 'ing')
+    if word.endswith('y'):
+        forms.add(word[:-1] + 'ies')
+    return forms
+
+
+class LinkScorer:
+    """Priority of a link in the frontier; higher scores are crawled first.
+
+    Subclass and override ``score`` to plug in another policy. Links with equal scores keep
+    their discovery order, so this base scorer (shallower first) crawls breadth-first.
+    """
+
+    def score(self, url: str, depth: int, text: str = '', position: int = 0) -> float:
+        return -float(depth)
+
+
+class KeywordLinkScorer(LinkScorer):
+    """Best-first scoring from the link's depth, keywords in its URL path and anchor text, and
+    its position on the page (content links near the top beat long footers and link lists)."""
+
+    def __init__(self, keywords: dict = None, penalties: dict = None, depth_weight: float = 1.0,
+                 text_weight: float = 0.75, position_weight: float = 0.5, query_penalty: float = 0.5):
+        self.weights = {**(keywords if keywords is not None else DEFAULT_KEYWORDS),
+                        **(penalties if penalties is not None else DEFAULT_PENALTIES)}
+        # Every form of every keyword; a keyword listed itself keeps its own weight (feed is not a form of fee)
+        self.forms = {}
+        for keyword, weight in self.weights.items():
+            for form in word_forms(keyword):
+                self.forms.setdefault(form, weight)
+        self.forms.update(self.weights)
+        self.depth_weight = depth_weight
+        self.text_weight = text_weight
+        self.position_weight = position_weight
+        self.query_penalty = query_penalty
+
+    def word_score(self, word: str) -> float:
+        """Weight of the keyword the word is a form of; 0 when it matches none"""
+        return self.forms.get(word, 0.0)
+
+    def text_score(self, text: str) -> float:
+        # 同一个词只算一次, 避免长路径 / 长锚文本刷分
+        return sum({word: self.word_score(word) for word in WORD.findall(text.lower())}.values())
+
+    def score(self, url: str, depth: int, text: str = '', position: int = 0) -> float:
+        parsed = urlparse(url)
+        score = -self.depth_weight * depth
+        score += self.text_score(parsed.path)
+        if text:
+            score += self.text_weight * self.text_score(text)
+        score += self.position_weight * 20 / (20 + max(0, position))
+        if parsed.query:
+            score -= self.query_penalty
+        return score
+
+
+LINK_SCORERS = {'keyword': KeywordLinkScorer, 'depth': LinkScorer}
+
+
+def build_link_scorer(name: str = 'keyword') -> LinkScorer:
+    if name not in LINK_SCORERS:
+        raise ValueError(f"Unknown link scorer {name!r}, expected one of {tuple(LINK_SCORERS)}")
+    return LINK_SCORERS[name]()
@@ -0,0 +1,135 @@
+import re
+from urllib.parse import urljoin
+import lxml.html
+
+WHITESPACE = re.compile(r'\s+')
+TRAILING_SPACES = re.compile(r'[ \t]+\n')
+BLANK_LINES = re.compile(r'\n{3,}')
+
+# 不输出内容的标签
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'head', 'title', 'meta', 'link', 'svg', 'iframe', 'object', 'canvas'}
+BLOCK_TAGS = {'p', 'div', 'section', 'article', 'main', 'aside', 'form', 'fieldset', 'address', 'figure',
+              'figcaption', 'dl', 'dt', 'dd', 'center', 'details', 'summary', 'body', 'html'}
+HEADINGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+
+class LxmlMarkdownConverter:
+    """Fast markdown converter that walks an lxml tree once and appends to a list buffer.
+
+    Covers what the crawled pages use (headings, paragraphs, links, emphasis, lists, tables, code,
+    quotes, images) in the same dialect as crawl4ai's DefaultMarkdownGenerator, without its
+    string re-parsing and filtering passes. Output is close but not identical, so switching
+    converters changes every page's content hash once. ``benchmark_markdown.py`` compares both.
+    """
+
+    def convert(self, html, base_url: str = '') -> str:
+        """Markdown of an HTML string or an already parsed lxml element"""
+        if isinstance(html, str):
+            if not html.strip():
+                return ''
+            html = lxml.html.document_fromstring(html)
+        self.base_url = base_url
+        out = []
+        self._node(html, out, 0)
+        markdown = BLANK_LINES.sub('\n\n', TRAILING_SPACES.sub('\n', ''.join(out)))
+        return markdown.strip() + '\n' if markdown.strip() else ''
+
+    def _render(self, element, list_depth: int) -> str:
+        out = []
+        self._children(element, out, list_depth)
+        return ''.join(out)
+
+    def _children(self, element, out, list_depth: int):
+        if element.text:
+            out.append(WHITESPACE.sub(' ', element.text))
+        for child in element:
+            self._node(child, out, list_depth)
+            if child.tail:
+                out.append(WHITESPACE.sub(' ', child.tail))
+
+    def _node(self, element, out, list_depth: int):
+        tag = element.tag
+        if not isinstance(tag, str) or tag in SKIP_TAGS:  # 注释 / 处理指令
+            return
+        tag = tag.lower()
+
+        if tag in HEADINGS:
+            text = self._render(element, list_depth).strip()
+            if text:
+                out.append(f"\n\n{'#' * HEADINGS[tag]} {text}\n\n")
+        elif tag in BLOCK_TAGS:
+            out.append('\n\n')
+            self._children(element, out, list_depth)
+            out.append('\n\n')
+        elif tag == 'br':
+            out.append('\n')
+        elif tag == 'hr':
+            out.append('\n\n---\n\n')
+        elif tag == 'a':
+            text = self._render(element, list_depth).strip()
+            href = (element.get('href') or '').strip()
+            if href and not href.startswith('javascript:'):
+                out.append(f"[{text}]({urljoin(self.base_url, href)})")
+            else:
+                out.append(text)
+        elif tag in ('strong', 'b'):
+            self._wrap(element, out, list_depth, '**')
+        elif tag in ('em', 'i'):
+            self._wrap(element, out, list_depth, '_')
+        elif tag == 'code':
+            text = element.text_content().strip()
+            if text:
+                out.append(f"`{text}`")
+        elif tag == 'pre':
+            out.append(f"\n\n```\n{element.text_content().strip(chr(10))}\n```\n\n")
+        elif tag == 'blockquote':
+            text = BLANK_LINES.sub('\n\n', self._render(element, list_depth)).strip()
+            out.append('\n\n' + '\n'.join(f"> {line}".rstrip() for line in text.split('\n')) + '\n\n')
+        elif tag in ('ul', 'ol'):
+            self._list(element, out, list_depth, ordered=tag == 'ol')
+        elif tag == 'li':  # <li> outside a list
+            out.append(f"\n  * {self._render(element, list_depth + 1).strip()}\n")
+        elif tag == 'table':
+            self._table(element, out, list_depth)
+        elif tag == 'img':
+            src = element.get('src')
+            if src:
+                out.append(f"![{element.get('alt', '')}]({urljoin(self.base_url, src)})")
+        else:
+            self._children(element, out, list_depth)
+
+    def _wrap(self, element, out, list_depth: int, mark: str):
+        text = self._render(element, list_depth)
+        if text.strip():
+            # keep the surrounding spaces outside the markers
+            leading, trailing = text[:len(text) - len(text.lstrip())], text[len(text.rstrip()):]
+            out.append(f"{leading}{mark}{text.strip()}{mark}{trailing}")
+
+    def _list(self, element, out, list_depth: int, ordered: bool):
+        indent = '  ' * list_depth
+        out.append('\n' if list_depth else '\n\n')
+        number = 0
+        for item in element:
+            if not isinstance(item.tag, str) or item.tag.lower() != 'li':
+                continue
+            number += 1
+            marker = f"{number}." if ordered else '*'
+            text = BLANK_LINES.sub('\n', self._render(item, list_depth + 1)).strip()
+            out.append(f"{indent}  {marker} {text}\n")
+        out.append('\n' if list_depth else '\n\n')
+
+    def _table(self, element, out, list_depth: int):
+        rows = []
+        for row in element.iter('tr'):
+            cells = [WHITESPACE.sub(' ', self._render(cell, list_depth)).strip().replace('|', '\\|')
+                     for cell in row if isinstance(cell.tag, str) and cell.tag.lower() in ('td', 'th')]
+            if cells:
+                rows.append(cells)
+        if not rows:
+            return
+        out.append('\n\n')
+        for index, cells in enumerate(rows):
+            out.append('| '.join(cells) + '\n')
+            if index == 0:
+                out.append('|'.join(['---'] * len(cells)) + '\n')
+        out.append('\n\n')
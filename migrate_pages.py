@@ -0,0 +1,90 @@
+import argparse
+import global_vars
+from elasticsearch import Elasticsearch, helpers
+from pipeline import ensure_page_index, page_doc_id, page_index_name
+
+
+def page_actions(hit, page_index: str):
+    """Index actions that copy the nested pages of one business document into the page index"""
+    source = hit['_source']
+    business_id = str(source.get('businessID', hit['_id']))
+    for page in source.get('pages') or []:
+        if not page.get('url'):
+            continue
+        yield {
+            "_op_type": "index",
+            "_index": page_index,
+            "_id": page_doc_id(business_id, page['url']),
+            "_source": {**page, 'businessID': business_id},
+        }
+
+
+def copy_batch(es, source_index: str, batch, drop_pages: bool, stats: dict):
+    """Copy the pages of a batch of businesses; with drop_pages, strip ``pages`` from every
+    business document whose pages were all copied, leaving the small summary document"""
+    actions, owners = [], []
+    for business_doc_id, business_actions in batch:
+        actions.extend(business_actions)
+        owners.extend([business_doc_id] * len(business_actions))
+
+    failed = set()
+    for owner, (ok, info) in zip(owners, helpers.streaming_bulk(es, actions, chunk_size=500, max_chunk_bytes=20 * 1024 * 1024,
+                                                              raise_on_error=False, request_timeout=120)):
+        if ok:
+            stats['pages'] += 1
+        else:
+            failed.add(owner)
+            stats['failed_pages'] += 1
+            global_vars.logger.error(f"Failed to copy a page of business {owner}: {next(iter(info.values()), {}).get('error')}")
+
+    stats['businesses'] += len(batch)
+    if not drop_pages:
+        return
+    drops = [{
+        "_op_type": "update",
+        "_index": source_index,
+        "_id": business_doc_id,
+        "script": {"source": "ctx._source.remove('pages')", "lang": "painless"},
+    } for business_doc_id, _ in batch if business_doc_id not in failed]
+    success, errors = helpers.bulk(es, drops, raise_on_error=False, request_timeout=120)
+    stats['dropped'] += success
+    for error in errors:
+        global_vars.logger.error(f"Failed to drop pages: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move nested business pages into one document per page.')
+    parser.add_argument('--Config', required=True, type=str, help='Configuration file path')
+    parser.add_argument('--Source', type=str, help='Business index with nested pages (default: ES_INDEX_NAME)')
+    parser.add_argument('--Target', type=str, help='Page index (default: ES_PAGE_INDEX_NAME or <source>_pages)')
+    parser.add_argument('--DropPages', action='store_true', help='Remove the pages array from business documents once copied')
+    parser.add_argument('--BatchSize', type=int, default=1000, help='Pages per bulk batch')
+    parser.add_argument('--ScanSize', type=int, default=20, help='Business documents per scroll page (they can be large)')
+    args = parser.parse_args()
+
+    global_vars.init_globals(args.Config)
+    source_index = args.Source or global_vars.config.get("ES_INDEX_NAME")
+    page_index = args.Target or page_index_name(source_index)
+    es = Elasticsearch(hosts=global_vars.config.get("ES_HOST"), api_key=global_vars.config.get("ES_API_KEY"))
+    ensure_page_index(es, page_index)
+
+    stats = {'businesses': 0, 'pages': 0, 'failed_pages': 0, 'dropped': 0}
+    batch, batch_pages = [], 0
+    hits = helpers.scan(es, index=source_index, query={"query": {"exists": {"field": "pages"}}},
+                        size=args.ScanSize, scroll='10m', request_timeout=360)
+    for hit in hits:
+        business_actions = list(page_actions(hit, page_index))
+        batch.append((hit['_id'], business_actions))
+        batch_pages += len(business_actions)
+        if batch_pages >= args.BatchSize:
+            copy_batch(es, source_index, batch, args.DropPages, stats)
+            global_vars.logger.info(f"Migrated {stats['businesses']} businesses, {stats['pages']} pages")
+            batch, batch_pages = [], 0
+    if batch:
+        copy_batch(es, source_index, batch, args.DropPages, stats)
+
+    global_vars.logger.info(f"Migration from {source_index} to {page_index} done: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from crawl4ai import DefaultMarkdownGenerator
+from markdown_converter import LxmlMarkdownConverter
+from parsed_page import ParsedPage
+from url_type_checker import URLType
+
+# 'crawl4ai': DefaultMarkdownGenerator, 'lxml': LxmlMarkdownConverter (faster, for bulk crawls)
+MARKDOWN_CONVERTERS = ('crawl4ai', 'lxml')
+
+_md_generator = None
+_converter = 'crawl4ai'
+
+
+def set_markdown_converter(name: str):
+    """Select the markdown converter of this process; TransformPool also runs it in every worker"""
+    global _converter
+    if name not in MARKDOWN_CONVERTERS:
+        raise ValueError(f"Unknown markdown converter {name!r}, expected one of {MARKDOWN_CONVERTERS}")
+    _converter = name
+
+
+def markdown_generator() -> DefaultMarkdownGenerator:
+    """One markdown generator per process, created on first use"""
+    global _md_generator
+    if _md_generator is None:
+        _md_generator = DefaultMarkdownGenerator() if _converter == 'crawl4ai' else LxmlMarkdownConverter()
+    return _md_generator
+
+
+def generate_markdown(html: str, url: str) -> str:
+    generator = markdown_generator()
+    if isinstance(generator, LxmlMarkdownConverter):
+        return generator.convert(html, url)
+    return generator.generate_markdown(html, url).raw_markdown
+
+
+def filter_html(html, domain = ''):
+    """Cleaned body, images, PDF and DOC links of an HTML string (see ParsedPage)"""
+    page = ParsedPage.from_html(html, domain=domain)
+    return page.cleaned_body, page.images, page.pdf_links, page.doc_links
+
+
+def transform_page(row: dict) -> dict:
+    """Clean a crawled page, convert it to markdown and hash the result.
+
+    This is the CPU-heavy part of the pipeline and runs in the TransformPool workers, so it only
+    takes and returns plain picklable data: the item row in, the fields to merge into it out.
+    Rows from the crawler carry the ParsedPage fields, so the HTML is not parsed again here.
+    """
+    if row['url_type'] in (URLType.PDF, URLType.DOCX) and 'cleaned_body' not in row:
+        return document_fields(row)
+    if 'cleaned_body' in row:
+        remaining_content, img_urls, pdf_urls, docx_urls = row['cleaned_body'], list(row['img_urls']), list(row['pdf_urls']), list(row['doc_urls'])
+    else:
+        remaining_content, img_urls, pdf_urls, docx_urls = filter_html(row['content'], row['domain'])
+    if row['depth'] == 0:
+        content = generate_markdown(row['content'], row['url'])
+    else:
+        content = generate_markdown(remaining_content, row['url'])
+
+    if URLType.PDF == row['url_type']:
+        pdf_urls.append(row['url'])
+    elif URLType.DOCX == row['url_type']:
+        docx_urls.append(row['url'])
+
+    return content_fields(content, img_urls, pdf_urls, docx_urls)
+
+
+def document_fields(row: dict) -> dict:
+    """A PDF / DOCX row: its content is already plain text from the DocumentExtractor (or empty)"""
+    pdf_urls = [row['url']] if row['url_type'] == URLType.PDF else []
+    docx_urls = [row['url']] if row['url_type'] == URLType.DOCX else []
+    return content_fields(row['content'] or '', [], pdf_urls, docx_urls)
+
+
+def content_fields(content: str, img_urls, pdf_urls, docx_urls) -> dict:
+    fields = {
+        'content': content,
+        'img_urls': sorted(list(set(img_urls))),
+        'pdf_urls': sorted(list(set(pdf_urls))),
+        'doc_urls': sorted(list(set(docx_urls))),
+    }
+
+    # 将内容、图片链接、PDF 链接拼接在一起, 生成内容哈希值
+    combined_string = content + ''.join(fields['img_urls']) + ''.join(fields['pdf_urls']) + ''.join(fields['doc_urls'])
+    fields['content_hash'] = hashlib.md5(combined_string.encode()).hexdigest()
+    return fields
+
+
+class TransformPool:
+    """Process pool for transform_page, so markdown conversion does not run on the crawl event loop.
+
+    ``submit`` blocks once ``max_pending`` pages are in flight, which bounds the memory held by
+    queued HTML; on an event loop use ``submit_async``, which waits for room without blocking the
+    loop. With ``workers`` = 0 pages are transformed inline on the calling thread.
+    Workers are spawned rather than forked because the crawler process already runs threads.
+    """
+
+    def __init__(self, workers: int, max_pending: int = None, converter: str = 'crawl4ai'):
+        self.workers = workers
+        self.executor = None
+        set_markdown_converter(converter)
+        if workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=set_markdown_converter, initargs=(converter,))
+        self.max_pending = max_pending or max(1, workers) * 4
+        self.pending = threading.BoundedSemaphore(self.max_pending)
+        self.pending_async = None  # asyncio.Semaphore of submit_async, created on the loop that uses it
+
+    def submit(self, row: dict) -> Future:
+        """Transform a page from a thread, blocking while the pool is full"""
+        self.pending.acquire()
+        return self._submit(row, self.pending.release)
+
+    async def submit_async(self, row: dict) -> Future:
+        """Transform a page from a coroutine; waits for room without blocking the event loop"""
+        if self.pending_async is None:
+            self.pending_async = asyncio.Semaphore(self.max_pending)
+        slots = self.pending_async
+        await slots.acquire()
+        loop = asyncio.get_running_loop()
+
+        def release():
+            # Done callbacks run in the executor's thread
+            try:
+                loop.call_soon_threadsafe(slots.release)
+            except RuntimeError:  # the loop is already closed
+                pass
+
+        return self._submit(row, release)
+
+    def _submit(self, row: dict, release) -> Future:
+        if self.executor is None:
+            future = Future()
+            try:
+                future.set_result(transform_page(row))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            try:
+                future = self.executor.submit(transform_page, row)
+            except Exception:
+                release()
+                raise
+        future.add_done_callback(lambda _: release())
+        return future
+
+    async def run(self, row: dict) -> dict:
+        """Transform a page from a coroutine without blocking the event loop"""
+        if self.executor is None:
+            return transform_page(row)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, transform_page, row)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,110 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import global_vars
+from crawl_journal import to_signed
+from url_fingerprint import url_fingerprint
+
+
+class NotModified(Exception):
+    """The server answered a conditional request with 304 Not Modified"""
+
+
+class PageValidators:
+    """HTTP validators of a page from an earlier crawl, plus the links it had, so an unchanged page
+    can still feed the frontier without being fetched"""
+
+    def __init__(self, url: str, etag: str = None, last_modified: str = None, links=None, last_seen: float = None):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.links = links or []
+        self.last_seen = last_seen
+
+    @classmethod
+    def from_headers(cls, url: str, headers) -> 'PageValidators':
+        """Validators from response headers (Scrapy Headers or a plain dict); None if there are none"""
+        def header(name):
+            value = headers.get(name) or headers.get(name.lower())
+            if isinstance(value, bytes):
+                value = value.decode('latin-1')
+            return value or None
+
+        etag, last_modified = header('ETag'), header('Last-Modified')
+        if not etag and not last_modified:
+            return None
+        return cls(url, etag, last_modified)
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageValidatorStore:
+    """SQLite store of PageValidators keyed by URL fingerprint, kept across runs"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS page_validators (
+                fp INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                links TEXT,
+                last_seen REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, url: str, fingerprint: int = None) -> PageValidators:
+        if fingerprint is None:
+            fingerprint = url_fingerprint(url)
+        with self.lock:
+            row = self.conn.execute("SELECT url, etag, last_modified, links, last_seen FROM page_validators WHERE fp = ?",
+                                    (to_signed(fingerprint),)).fetchone()
+        if not row:
+            return None
+        return PageValidators(row[0], row[1], row[2], json.loads(row[3]) if row[3] else [], row[4])
+
+    def save(self, validators: PageValidators, fingerprint: int = None):
+        if fingerprint is None:
+            fingerprint = url_fingerprint(validators.url)
+        with self.lock:
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO page_validators (fp, url, etag, last_modified, links, last_seen) VALUES (?, ?, ?, ?, ?, ?)",
+                    (to_signed(fingerprint), validators.url, validators.etag, validators.last_modified,
+                     json.dumps(validators.links), time.time()))
+                self.conn.commit()
+            except Exception as e:
+                global_vars.logger.error(f"Error saving validators for {validators.url}: {e}")
+
+    def touch(self, url: str, fingerprint: int = None):
+        """Refresh last_seen of a page that was confirmed unchanged"""
+        if fingerprint is None:
+            fingerprint = url_fingerprint(url)
+        with self.lock:
+            try:
+                self.conn.execute("UPDATE page_validators SET last_seen = ? WHERE fp = ?",
+                                  (time.time(), to_signed(fingerprint)))
+                self.conn.commit()
+            except Exception as e:
+                global_vars.logger.error(f"Error touching validators for {url}: {e}")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,107 @@
+from typing import List
+from urllib.parse import urljoin
+import lxml.html
+from lxml import etree
+from scrapy.http import TextResponse
+from scrapy.linkextractors import IGNORED_EXTENSIONS
+from scrapy.linkextractors.lxmlhtml import LxmlLinkExtractor
+
+# 清洗正文时删除的标签
+EXCLUDED_TAGS = ['nav', 'footer', 'header', 'br']
+# 文档链接保留下来, 由 LinkClassifier 分到文档队列
+LINK_DENY_EXTENSIONS = [extension for extension in IGNORED_EXTENSIONS if extension not in ('pdf', 'doc', 'docx')]
+
+
+class PageLink:
+    """A link of a page with its anchor text and its position among the page's links"""
+    __slots__ = ('url', 'text', 'position')
+
+    def __init__(self, url: str, text: str, position: int):
+        self.url = url
+        self.text = text
+        self.position = position
+
+    def __repr__(self):
+        return f"PageLink({self.url!r}, {self.text!r}, {self.position})"
+
+
+class ParsedPage:
+    """A fetched page parsed exactly once, shared by link extraction, HTML cleaning and markdown.
+
+    The tree is the response's own cached parsel/lxml tree, so the JavaScript check of the HTTP
+    tier, link extraction and cleaning all reuse one parse. Links are read from the full tree;
+    the tree is then cleaned in place (comments, nav/footer/header/br and images removed) and the
+    body serialized once into ``cleaned_body``. The response's selector sees the cleaned tree
+    afterwards. Everything exposed is plain data that can be sent to the transform processes.
+    """
+
+    def __init__(self, response: TextResponse, domain: str = ''):
+        self.url = response.url
+        self.domain = domain
+        self.links: List[PageLink] = []
+        self.images: List[str] = []
+        self.pdf_links: List[str] = []
+        self.doc_links: List[str] = []
+        self.cleaned_body = ""
+        if not response.text or not response.text.strip():
+            return
+        # LxmlLinkExtractor works on response.selector, the same cached tree cleaned below
+        self.links = [PageLink(link.url, link.text.strip(), position)
+                      for position, link in enumerate(LxmlLinkExtractor(unique=True, deny_extensions=LINK_DENY_EXTENSIONS).extract_links(response))]
+        self._clean(response.selector.root)
+
+    @classmethod
+    def from_html(cls, html: str, url: str = 'http://localhost/', domain: str = '') -> 'ParsedPage':
+        return cls(TextResponse(url=url, body=html or '', encoding='utf-8'), domain)
+
+    def pure_link(self, url: str) -> str:
+        if len(url) == 0:
+            return ''
+        if url.startswith('//'):  # 如果以 "//" 开头
+            url = 'http:' + url  # 添加 "http:"
+        elif self.domain and not url.startswith(('http://', 'https://')):
+            url = urljoin(f"http://{self.domain}", url)
+        return url
+
+    def _clean(self, root):
+        # 删除所有注释和不需要的标签
+        for element in list(root.iter(etree.Comment)) + [element for tag in EXCLUDED_TAGS for element in root.iter(tag)]:
+            if element.getparent() is not None:
+                element.drop_tree()
+
+        body = root.find('body')
+        if body is None:
+            body = root
+
+        for img in list(body.iter('img')):
+            img_url = img.get('src')
+            if img_url is not None:  # 确保<img>标签有src属性
+                if img_url.find('base64') >= 0:
+                    img.drop_tree()
+                    continue
+                if len(img_url) == 0:
+                    continue
+                self.images.append(self.pure_link(img_url))
+            img.drop_tree()
+
+        # 一次遍历同时收集 PDF 和 DOC 链接
+        for a_tag in root.iter('a'):
+            href = a_tag.get('href')
+            if not href:
+                continue
+            lower_href = href.lower()
+            if '.pdf' in lower_href:
+                self.pdf_links.append(self.pure_link(href))
+            if '.doc' in lower_href:  # 同时匹配 .doc 和 .docx
+                self.doc_links.append(self.pure_link(href))
+
+        self.cleaned_body = lxml.html.tostring(body, encoding='unicode')
+
+    def transform_fields(self) -> dict:
+        """The parts of the page the pipeline's transform stage needs instead of the raw HTML"""
+        return {
+            'cleaned_body': self.cleaned_body,
+            'img_urls': self.images,
+            'pdf_urls': self.pdf_links,
+            'doc_urls': self.doc_links,
+        }
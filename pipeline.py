@@ -1,8 +1,8 @@
 import csv
 import json
-from bs4 import BeautifulSoup, Comment
-from elasticsearch import Elasticsearch, helpers, AsyncElasticsearch
-from crawl4ai import PruningContentFilter, DefaultMarkdownGenerator
+from elasticsearch import Elasticsearch, helpers, AsyncElasticsearch, NotFoundError
+from elasticsearch.helpers import async_streaming_bulk
+import asyncio
 import hashlib
 import global_vars
 import time
@@ -15,107 +15,327 @@ import threading
 import copy
 import datetime
 from url_type_checker import *
+from content_hash_index import ContentHashIndex
+from dead_letter import CircuitBreaker, DeadLetterSpool, backoff_delay
+from page_transform import TransformPool, filter_html, transform_page
+from url_fingerprint import url_fingerprint
+
+# 批量响应中可以重试的单条失败状态
+RETRY_STATUSES = (409, 429, 500, 502, 503, 504)
+# 其中表示 ES 过载的状态, 与请求失败一样计入熔断器
+PUSHBACK_STATUSES = (429, 500, 502, 503, 504)
+# 预加载内容哈希时只读取这两个字段
+HASH_FIELDS = ['pages.url', 'pages.content_hash']
+
+# ES 存储布局: nested = 每个商家一个文档, 页面在 pages 数组中;
+# per_page = 每个页面一个文档 (页面索引) + 一个小的商家摘要文档
+LAYOUT_NESTED = 'nested'
+LAYOUT_PER_PAGE = 'per_page'
+BUSINESS_FIELDS = ['state', 'county', 'googleReview', 'googleReviewRating', 'googleReviewCount',
+                   'domain', 'googleEntry', 'businessFullName', 'businessID', 'website']
+MAX_PAGES_PER_BUSINESS = 10000
+PAGE_INDEX_MAPPINGS = {
+    "properties": {
+        "businessID": {"type": "keyword"},
+        "url": {"type": "keyword"},
+        "title": {"type": "text"},
+        "content": {"type": "text"},
+        "img_urls": {"type": "keyword"},
+        "doc_urls": {"type": "keyword"},
+        "pdf_urls": {"type": "keyword"},
+        "content_hash": {"type": "keyword"},
+        "last_modified": {"type": "date", "format": "epoch_millis"},
+    }
+}
+# 内容哈希相同则不修改页面文档 (noop), 否则整体替换
+PAGE_UPDATE_SCRIPT = """
+    if (ctx._source.content_hash == params.page.content_hash) {
+        ctx.op = 'noop';
+    } else {
+        ctx._source.putAll(params.page);
+    }
+"""
+
+
+def page_index_name(index_name: str) -> str:
+    return global_vars.config.get("ES_PAGE_INDEX_NAME") or f"{index_name}_pages"
+
+
+def page_doc_id(business_id, url: str) -> str:
+    """Id of a page document in the per_page layout: business plus URL fingerprint"""
+    return f"{business_id}-{url_fingerprint(url):016x}"
+
+
+def ensure_page_index(es, index_name: str):
+    """Create the page index with its mapping if it does not exist yet"""
+    if not es.indices.exists(index=index_name):
+        es.indices.create(index=index_name, mappings=PAGE_INDEX_MAPPINGS)
+
+
+def page_counts(es, page_index: str, business_ids) -> dict:
+    """Number of stored pages per business in the per_page layout"""
+    business_ids = [str(business_id) for business_id in business_ids]
+    if not business_ids:
+        return {}
+    response = es.search(index=page_index, size=0, query={"terms": {"businessID": business_ids}},
+                         aggs={"by_business": {"terms": {"field": "businessID", "size": len(business_ids)}}},
+                         request_timeout=360)
+    return {str(bucket['key']): bucket['doc_count'] for bucket in response['aggregations']['by_business']['buckets']}
+
 class CsvPipeline:
     def __init__(self):
+        self._setup()
+        self.es = Elasticsearch(**self.es_config)  # 创建ES客户端
+        if self.layout == LAYOUT_PER_PAGE:
+            try:
+                ensure_page_index(self.es, self.page_index)
+            except Exception as e:
+                self.logger.warning(f"Failed to create page index {self.page_index}: {e}")
+        self.flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flush_requested = threading.Event()
+        threading.Thread(target=self._flush_loop, name="es-bulk-flush", daemon=True).start()
 
-        es_config = {
+    def _setup(self):
+        """Configuration shared by the blocking and the asyncio pipeline"""
+        self.es_config = {
             "hosts": global_vars.config.get("ES_HOST"),
             "api_key": global_vars.config.get("ES_API_KEY")
         }
         self.index_name = global_vars.config.get("ES_INDEX_NAME")
         self.logger = global_vars.logger
+        self.layout = global_vars.config.get("ES_STORAGE_LAYOUT") or LAYOUT_NESTED
+        if self.layout not in (LAYOUT_NESTED, LAYOUT_PER_PAGE):
+            raise ValueError(f"Unknown ES_STORAGE_LAYOUT {self.layout!r}")
+        self.page_index = page_index_name(self.index_name)
+        self.pipeline_lock = threading.Lock() # 线程锁, 保护缓冲区和 summarized
+        self.summarized = set()  # 本次运行已写入摘要文档的 (businessID, 是否有内容)
 
-        # self._buffer = []  # 数据缓冲区，用于暂存待写入的数据
-        # self.md_generator = DefaultMarkdownGenerator(content_filter=PruningContentFilter(threshold=0.35))  # 
-        
-        self.md_generator = DefaultMarkdownGenerator()  # 
-        
-        # Markdown生成器
-        self.es = Elasticsearch(**es_config)  # 创建ES客户端
-        self.batch_size = 1
+        # 页面清洗和 Markdown 生成在进程池中执行, 不占用爬虫的事件循环
+        transform_workers = int(global_vars.config.get("TRANSFORM_WORKERS", 1))
+        self.transform_pool = TransformPool(transform_workers, int(global_vars.config.get("TRANSFORM_QUEUE_SIZE", 0)) or None,
+                                            global_vars.config.get("MARKDOWN_CONVERTER", "crawl4ai"))
+        # 批量写入: 条数 / 字节数 / 最长等待时间任一达到上限即写入
+        self.batch_size = int(global_vars.config.get("ES_BULK_BATCH_SIZE", 50))
+        self.batch_bytes = int(global_vars.config.get("ES_BULK_BATCH_BYTES", 5 * 1024 * 1024))
+        self.batch_max_age = float(global_vars.config.get("ES_BULK_MAX_AGE_SECONDS", 5))
+        self._buffer = []  # 数据缓冲区，用于暂存待写入的数据
+        self._buffer_bytes = 0
+        self._buffer_started = 0.0
+        # 写入失败时的指数退避重试次数, 熔断器和死信文件
+        self.max_retries = int(global_vars.config.get("ES_MAX_RETRIES", 8))
+        self.breaker = CircuitBreaker(int(global_vars.config.get("ES_BREAKER_FAILURES", 5)),
+                                      float(global_vars.config.get("ES_BREAKER_RESET_SECONDS", 60)))
+        self.dead_letters = DeadLetterSpool(global_vars.config.get("ES_DEAD_LETTER_DIR") or "data/dead_letter")
+        # 已写入页面的内容哈希, 内容未变化的页面不再发送到ES
+        self.hash_index = ContentHashIndex(global_vars.config.get("CONTENT_HASH_INDEX_PATH"),
+                                           scope=f"{self.layout}:{self.page_index if self.layout == LAYOUT_PER_PAGE else self.index_name}")
         # self.logger.info("new pipeline!!!")
-        self.pipeline_lock = threading.Lock() # 线程锁
+
     def process_item(self, item, spider):
-        self.write(item)
-        return item
+        # 在爬虫的事件循环中调用时返回协程: 转换进程池满时异步等待, 不阻塞事件循环
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.write(item)
+            return item
+        return self.write_async(item)
     
     def filter_html(self, html, domain = ''):
-        # 提取图片信息并保存到列表
-        images = []
-        pdf_links = []
-        docx_links = []
-        body = ""
-
-        if not html:
-            return str(body), images, pdf_links, docx_links
-        soup = BeautifulSoup(html, 'lxml')
-        if not soup.body:
-            soup = BeautifulSoup(f"<body>{html}</body>", "lxml")
-        
-        # 删除所有注释
-        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
-            comment.decompose()  # 或者使用 comment.decompose()
-        
-        excluded_tags = [
-            "nav",
-            "footer",
-            "header",
-            # "aside",
-            # "script",
-            "br"
-            # "style",
-            # "form",
-            # "iframe",
-            # "noscript",
-        ]
-        
-        for tag in excluded_tags:
-            for element in soup.find_all(tag):
-                element.decompose()
-                
-        body = soup.find("body")            
-
-        def pure_link(url):
-            if len(url) == 0:
-                return ''
-            if url.startswith('//'):  # 如果以 "//" 开头
-                url = 'http:' + url  # 添加 "http:"
-            elif domain and not url.startswith(('http://', 'https://')):
-                url = urljoin(f"http://{domain}", url)
-            return url
-
-
-        for img in body.find_all('img'):
-            if 'src' in img.attrs:  # 确保<img>标签有src属性
-                img_url = img['src']
-                if img_url.find('base64') >= 0:
-                    img.decompose()
-                    continue
-                if len(img_url) == 0:
-                    continue
-                img_url = pure_link(img_url)
-                images.append(img_url)
-            img.decompose()
-        
+        return filter_html(html, domain)
 
-        for a_tag in soup.find_all('a', href=True):  # 查找所有具有 href 属性的 <a> 标签
-            href = a_tag['href']
-            if href and '.pdf' in href.lower():  # 检查 href 是否包含 "pdf" （不区分大小写）
-                pdf_url = pure_link(href)
-                pdf_links.append(pdf_url)
+    def prime_hashes(self, business_id):
+        """Load the content hashes of a business once with one ES fetch; the disk tier only stands in when ES fails"""
+        if self.hash_index.is_primed(business_id):
+            return
+        pages = []
+        try:
+            if self.layout == LAYOUT_PER_PAGE:
+                response = self.es.search(index=self.page_index, **self._hash_query(business_id))
+                pages = self._hash_hits(response)
+            else:
+                doc = self.es.get(index=self.index_name, id=business_id, source_includes=HASH_FIELDS)
+                pages = self._hash_pages(doc)
+        except NotFoundError:
+            pass
+        except Exception as e:
+            # Without the hashes nothing is skipped, every page is written as before
+            self.logger.warning(f"Failed to fetch content hashes for businessID={business_id}: {e}")
+            if self.hash_index.load(business_id):
+                return
+        self.hash_index.prime(business_id, pages)
 
-        for a_tag in soup.find_all('a', href=True):  # 查找所有具有 href 属性的 <a> 标签
-            href = a_tag['href']
-            if href and ('.doc' in href.lower() or '.docx' in href.lower()):  # 检查 href 是否包含 "doc" （不区分大小写）
-                doc_url = pure_link(href)
-                docx_links.append(doc_url)
-        return str(body), images, pdf_links, docx_links
+    @staticmethod
+    def _hash_pages(doc):
+        return [(page.get('url'), page.get('content_hash')) for page in doc['_source'].get('pages') or []]
+
+    @staticmethod
+    def _hash_query(business_id):
+        return {'query': {'term': {'businessID': str(business_id)}}, 'source': ['url', 'content_hash'],
+                'size': MAX_PAGES_PER_BUSINESS}
+
+    @staticmethod
+    def _hash_hits(response):
+        return [(hit['_source'].get('url'), hit['_source'].get('content_hash')) for hit in response['hits']['hits']]
+
+    @staticmethod
+    def is_empty_page(row):
+        return (not row['content'] or row['content'] == "") and row['url_type'] == URLType.HTML
 
     def write(self, item):
+        self.prime_hashes(item['row']['businessID'])
+        if self._write_empty(item):
+            return
+        # 清洗和 Markdown 转换在进程池中执行, 完成后由回调放入缓冲区
+        future = self.transform_pool.submit(item['row'])
+        future.add_done_callback(lambda future: self._transformed(item, future))
+
+    async def write_async(self, item):
+        """write() for callers on an event loop: waits for room in the transform pool instead of blocking"""
+        business_id = item['row']['businessID']
+        if not self.hash_index.is_primed(business_id):
+            # 同步ES客户端的 get / search 会阻塞, 放到线程池中执行
+            await asyncio.get_running_loop().run_in_executor(None, self.prime_hashes, business_id)
+        if not self._write_empty(item):
+            future = await self.transform_pool.submit_async(item['row'])
+            future.add_done_callback(lambda future: self._transformed(item, future))
+        return item
+
+    def _write_empty(self, item) -> bool:
+        """Buffer an empty page directly; False if the page needs transforming"""
+        if not self.is_empty_page(item['row']):
+            return False
+        for entry in self.build_entries(item):
+            self._add(entry)
+        return True
+
+    def _transformed(self, item, future):
+        try:
+            entries = self.build_entries(item, future.result())
+        except Exception as e:
+            self.logger.error(f"Error transforming page businessID={item['row']['businessID']}, url={item['row']['url']}: {e}")
+            return
+        for entry in entries:
+            self._add(entry)
+
+    def _add(self, entry):
+        """将文档添加到缓冲区, 达到条数 / 字节数上限时通知写入线程批量写入 Elasticsearch"""
+        with self.pipeline_lock:
+            if not self._buffer:
+                self._buffer_started = time.time()
+            self._buffer.append(entry)
+            self._buffer_bytes += entry['size']
+            should_flush = len(self._buffer) >= self.batch_size or self._buffer_bytes >= self.batch_bytes
+        if should_flush:
+            self._flush_requested.set()
+
+    def build_entries(self, item, fields=None):
+        """The ES update actions of a page in the configured storage layout.
+
+        The item's optional ``on_stored`` callback rides on the page's entry and runs once ES accepted
+        it or it was spooled to the dead letter file; it runs right away when nothing has to be written.
+        """
+        if self.layout == LAYOUT_PER_PAGE:
+            entries = self.build_page_entries(item, fields)
+        else:
+            entry = self.build_entry(item, fields)
+            entries = [entry] if entry is not None else []
+        on_stored = item.get('on_stored')
+        if on_stored is not None:
+            if entries:
+                entries[-1]['on_stored'] = on_stored
+            else:
+                self._run_stored(on_stored)
+        return entries
+
+    def _run_stored(self, on_stored):
+        try:
+            on_stored()
+        except Exception as e:
+            self.logger.error(f"Error in on_stored callback: {e}")
+
+    def _apply_fields(self, item, fields):
+        """Merge the transform_page ``fields`` (computed here when not given) into the row.
+        Returns the content hash, or None when the page is unchanged since it was last written."""
+        if fields is None:
+            fields = transform_page(item['row'])
+        item['row'].update(fields)
+        item['row'].pop('cleaned_body', None)
+        content_hash = fields['content_hash']
+
+        # 内容未变化, 跳过ES更新
+        if self.hash_index.unchanged(item['row']['businessID'], item['row']['url'], content_hash):
+            self.logger.info(f"proc {item['row']['processID']} 内容未变化, 跳过写入, depth={item['row']['depth']}, businessID={item['row']['businessID']}, url={item['row']['url']}")
+            return None
+        return content_hash
+
+    def _entry(self, item, action, content_hash):
+        return {
+            'action': action,
+            'size': len(json.dumps(action, default=str)),
+            'businessID': item['row']['businessID'],
+            'url': item['row']['url'],
+            'processID': item['row']['processID'],
+            'depth': item['row']['depth'],
+            'content_hash': content_hash,
+        }
+
+    def build_page_entries(self, item, fields=None):
+        """per_page 布局: 页面写入自己的文档 (id = 商家 + URL 指纹), 商家摘要文档每次运行只更新一次"""
+        row = item['row']
+        business_id = row['businessID']
+        entries = []
+        has_content = not self.is_empty_page(row)
+        if has_content:
+            content_hash = self._apply_fields(item, fields)
+            if content_hash is None:
+                return []
+            page = {
+                'businessID': str(business_id),
+                'url': row['url'],
+                'title': row['title'],
+                'content': row['content'],
+                'img_urls': row['img_urls'],
+                'doc_urls': row['doc_urls'],
+                'pdf_urls': row['pdf_urls'],
+                'content_hash': content_hash,
+                'last_modified': int(time.time() * 1000)
+            }
+            entries.append(self._entry(item, {
+                "_op_type": "update",
+                "_index": self.page_index,
+                "_id": page_doc_id(business_id, row['url']),
+                "script": {"source": PAGE_UPDATE_SCRIPT, "lang": "painless", "params": {'page': page}},
+                "upsert": page
+            }, content_hash))
+        else:
+            self.logger.warning(f"empty pages: {business_id}")
+
+        with self.pipeline_lock:
+            summarize = (business_id, has_content) not in self.summarized
+            self.summarized.add((business_id, has_content))
+        if summarize:
+            summary = {k: row[k] for k in BUSINESS_FIELDS if k in row}
+            if has_content:
+                # 有页面内容变化时刷新时间
+                summary['refresh_pages_time'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            entries.insert(0, self._entry(item, {
+                "_op_type": "update",
+                "_index": self.index_name,
+                "_id": business_id,
+                "doc": summary,
+                "doc_as_upsert": True,
+                "retry_on_conflict": 5
+            }, None))
+        return entries
+
+    def build_entry(self, item, fields=None):
+        """Build the nested-layout ES update action of a page from the transform_page ``fields``
+        (computed here when not given). Returns None when the page is unchanged since it was last written."""
         # 生成文档ID
         doc_id = item['row']['businessID']
         # 如果 content 是空字符串，则构造一个不包含 pages 的文档
-        is_empty_page = (not item['row']['content'] or item['row']['content'] == "") and item['row']['url_type'] == URLType.HTML
+        is_empty_page = self.is_empty_page(item['row'])
         if is_empty_page:
             es_doc = {
                 'doc_id': doc_id,
@@ -136,34 +356,9 @@ class CsvPipeline:
                 }
             }
         else:
-            remaining_content, img_urls, pdf_urls, docx_urls = self.filter_html(item['row']['content'], item['row']['domain'])
-            if item['row']['depth'] == 0:
-                item['row']['content'] = self.md_generator.generate_markdown(item['row']['content'], item['row']['url']).raw_markdown
-            else:
-                item['row']['content'] = self.md_generator.generate_markdown(remaining_content, item['row']['url']).raw_markdown
-
-            if URLType.PDF == item['row']['url_type']:
-                pdf_urls.append(item['row']['url'])
-            elif URLType.DOCX == item['row']['url_type']:
-                docx_urls.append(item['row']['url'])
-
-            item['row']['img_urls'] = sorted(list(set(img_urls)))
-            item['row']['pdf_urls'] = sorted(list(set(pdf_urls)))
-            item['row']['doc_urls'] = sorted(list(set(docx_urls)))
-
-            # 生成内容哈希值
-            content_string = item['row']['content']
-            image_string = ''.join(item['row']['img_urls'])  # 将图片链接列表转换为字符串
-            pdf_string = ''.join(item['row']['pdf_urls'])    # 将 PDF 链接列表转换为字符串
-            docx_string = ''.join(item['row']['doc_urls'])  # 将 DOCX 链接列表转换为字符串
-
-            # 将内容、图片链接、PDF 链接拼接在一起
-            combined_string = content_string + image_string + pdf_string + docx_string
-
-            # 计算哈希值
-            content_hash = hashlib.md5(combined_string.encode()).hexdigest()
-            # (可选) 将哈希值添加到item中
-            item['row']['content_hash'] = content_hash
+            content_hash = self._apply_fields(item, fields)
+            if content_hash is None:
+                return None
             current_time_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             # 构造 Elasticsearch 文档
@@ -241,60 +436,285 @@ class CsvPipeline:
                 }
             }
         
-        # 将文档添加到缓冲区
-        # self._buffer.append(es_doc)
-        
-        # 如果缓冲区达到批量大小，则写入 Elasticsearch
-        # if len(self._buffer) >= self.batch_size:
-        self._bulk_write(es_doc, item)
-        
+        action = {
+            "_op_type": "update",  # 更新操作
+            "_index": self.index_name,  # 索引名称
+            "_id": es_doc['doc_id'],  # 文档ID
+            "script": es_doc['script'],  # 更新脚本
+            "upsert": es_doc['upsert'],  # 插入数据
+            "retry_on_conflict": 5  # 同一商家的多个页面更新同一个文档
+        }
+        entry = self._entry(item, action, None if is_empty_page else content_hash)
         if is_empty_page:
             self.logger.warning(f"empty pages: {item['row']['businessID']}")
+        return entry
+
+    def flush(self):
+        """Send everything buffered so far in one bulk request"""
+        with self.flush_lock:  # 同一时间只有一个批量请求, 保证同一文档的更新顺序
+            with self.pipeline_lock:
+                batch, self._buffer, self._buffer_bytes = self._buffer, [], 0
+            if batch:
+                self._bulk_write(batch)
+
+    def _flush_loop(self):
+        """Flush full buffers, and buffers older than batch_max_age so a slow site does not hold pages back"""
+        while not self._closed.is_set():
+            requested = self._flush_requested.wait(self.batch_max_age / 2)
+            self._flush_requested.clear()
+            with self.pipeline_lock:
+                expired = bool(self._buffer) and time.time() - self._buffer_started >= self.batch_max_age
+            if requested or expired:
+                try:
+                    self.flush()
+                except Exception as e:
+                    self.logger.error(f"Error flushing ES buffer: {e}")
+
+    def _written(self, entry):
+        if 'on_stored' in entry:
+            self._run_stored(entry['on_stored'])
+        if entry['content_hash'] is not None:
+            self.hash_index.record(entry['businessID'], entry['url'], entry['content_hash'])
+            self.logger.info(f"proc {entry['processID']} 完成写入, depth={entry['depth']}, businessID={entry['businessID']}, url={entry['url']}")
+
+    def _check_result(self, entry, ok, info, retry) -> bool:
+        """Handle the bulk result of one entry, appending it to ``retry`` if it may succeed later.
+        Returns True when ES pushed the entry back because it is overloaded (429 / 5xx)."""
+        if ok:
+            self._written(entry)
+            return False
+        result = next(iter(info.values()), {})
+        if result.get('status') in RETRY_STATUSES:
+            retry.append(entry)
         else:
-            self.logger.info(f"proc {item['row']['processID']} 完成写入, depth={item['row']['depth']}, businessID={item['row']['businessID']}, url={item['row']['url']}")
-        del item  # 释放内存
+            self.logger.error(f" 写入ES失败: proc {entry['processID']}, depth={entry['depth']}, businessID={entry['businessID']}, url={entry['url']} \n {result.get('error')}")
+        return result.get('status') in PUSHBACK_STATUSES
 
-    def _bulk_write(self, doc, item):
+    def _bulk_write(self, batch):
         """
         将缓冲区中的数据批量写入 Elasticsearch。
-        如果写入失败，会进行重试。
+        逐条检查批量响应: 成功的记录内容哈希, 可重试的失败 (429 / 5xx / 版本冲突) 连同请求异常一起
+        按指数退避重试, 其余失败记录日志后丢弃。重试用尽或熔断器打开时写入死信文件。
         """
-        max_retries = 100  # 最大重试次数
-        retry_count = 0
+        attempt = 0
+        pending = batch
         
-        while retry_count < max_retries:
+        while pending:
+            if not self.breaker.allow():
+                self._dead_letter(pending, "circuit breaker open")
+                return
+            processed = 0
+            retry = []
             try:
-                actions = []
-                # for doc in self._buffer:
-                if True:
-                    actions.append({
-                        "_op_type": "update",  # 更新操作
-                        "_index": self.index_name,  # 索引名称
-                        "_id": doc['doc_id'],  # 文档ID
-                        "script": doc['script'],  # 更新脚本
-                        "upsert": doc['upsert']  # 插入数据
-                    })
-                
-                # 使用 helpers.bulk 批量写入
-                success, failed = helpers.bulk(
-                    self.es, 
-                    actions, 
-                    stats_only=True,
+                # streaming_bulk 按提交顺序逐条返回结果
+                results = helpers.streaming_bulk(
+                    self.es,
+                    [entry['action'] for entry in pending],
+                    chunk_size=len(pending),
+                    max_chunk_bytes=self.batch_bytes * 2,
+                    raise_on_error=False,
                     request_timeout=60  # 设置超时时间为60秒
                 )
-                # self._buffer.clear()  # 清空缓冲区
-                break
-            except Exception as e:
-                retry_count += 1
-                if retry_count < max_retries:
-                    pass
-                    # self.logger.warning(f" 写入ES失败，正在重试 ({retry_count}/{max_retries}): proc {item['row']['processID']}, depth={item['row']['depth']}, businessID={item['row']['businessID']}, url={item['row']['url']} \n {str(e)}")
+                pushed_back = False
+                for entry, (ok, info) in zip(pending, results):
+                    processed += 1
+                    pushed_back |= self._check_result(entry, ok, info, retry)
+                # 单条 429 / 5xx 是 ES 过载的信号, 这样的批次算作一次失败
+                if pushed_back:
+                    self.breaker.record_failure()
                 else:
-                    self.logger.error(f" 写入ES失败，已达到最大重试次数: proc {item['row']['processID']}, depth={item['row']['depth']}, businessID={item['row']['businessID']}, url={item['row']['url']} \n {str(e)}")
-                    self.logger.exception("详细错误信息:")  # 记录完整的异常堆栈信息
-                    # self._buffer.clear()  # 清空缓冲区，避免数据堆积
+                    self.breaker.record_success()
+                pending = retry
+                error = "retriable item failures"
+            except Exception as e:
+                self.breaker.record_failure()
+                pending = retry + pending[processed:]
+                error = str(e)
+            if pending:
+                attempt += 1
+                if attempt > self.max_retries:
+                    self._dead_letter(pending, error)
+                    return
+                delay = backoff_delay(attempt)
+                self.logger.warning(f" 写入ES失败，{delay:.1f}s 后重试 {len(pending)} 条 ({attempt}/{self.max_retries}): {error}")
+                time.sleep(delay)
+
+    def _dead_letter(self, entries, reason):
+        self.dead_letters.write([entry['action'] for entry in entries])
+        for entry in entries:
+            if 'on_stored' in entry:
+                self._run_stored(entry['on_stored'])
+        self.logger.error(f" 写入ES失败 ({reason}), {len(entries)} 条写入死信文件 {self.dead_letters.path}, "
+                          f"第一条 businessID={entries[0]['businessID']}, url={entries[0]['url']}")
 
 
     def close_spider(self, spider):
-        self.logger.info("close pipeline!!!")
-        # self._bulk_write()
\ No newline at end of file
+        self.transform_pool.close()  # 等待进程池中的页面转换完成并进入缓冲区
+        self._closed.set()
+        self._flush_requested.set()
+        self.flush()
+        self.logger.info(f"close pipeline!!! skipped {self.hash_index.skipped} unchanged pages, "
+                         f"spooled {self.dead_letters.spooled} failed writes")
+        self.hash_index.close()
+
+
+class AsyncCsvPipeline(CsvPipeline):
+    """CsvPipeline for the crawler event loop, built on AsyncElasticsearch.
+
+    ``process_item`` is a coroutine that hands the update to a bounded queue; when the writer falls
+    behind it waits for room, which slows the crawl down instead of piling up pages in memory. A
+    single writer task drains the queue in batches (same count / size / age limits as CsvPipeline)
+    with async_streaming_bulk, so ES round trips overlap with fetching.
+    """
+
+    def __init__(self, queue_size: int = None):
+        self._setup()
+        self.es = AsyncElasticsearch(**self.es_config)
+        self.queue_size = queue_size or int(global_vars.config.get("ES_ASYNC_QUEUE_SIZE", self.batch_size * 4))
+        self.queue = None
+        self.transform_queue = None
+        self.writer_task = None
+        self.transform_tasks = []
+
+    def start(self):
+        """Create the queues, the transform tasks and the writer task on the running loop"""
+        if self.writer_task is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+            self.transform_queue = asyncio.Queue(maxsize=self.queue_size)
+            self.writer_task = asyncio.ensure_future(self._writer())
+            self.transform_tasks = [asyncio.ensure_future(self._transformer())
+                                    for _ in range(max(1, self.transform_pool.workers))]
+
+    async def process_item(self, item, spider):
+        self.start()
+        await self.prime_hashes(item['row']['businessID'])
+        # 队列满时等待, 形成背压
+        if self.is_empty_page(item['row']):
+            for entry in self.build_entries(item):
+                await self.queue.put(entry)
+        else:
+            await self.transform_queue.put(item)
+        return item
+
+    async def _transformer(self):
+        """Feed pages through the transform pool, one at a time per task, into the write queue"""
+        while True:
+            item = await self.transform_queue.get()
+            try:
+                for entry in self.build_entries(item, await self.transform_pool.run(item['row'])):
+                    await self.queue.put(entry)
+            except Exception as e:
+                self.logger.error(f"Error transforming page businessID={item['row']['businessID']}, url={item['row']['url']}: {e}")
+            finally:
+                self.transform_queue.task_done()
+
+    async def prime_hashes(self, business_id):
+        if self.hash_index.is_primed(business_id):
+            return
+        pages = []
+        try:
+            if self.layout == LAYOUT_PER_PAGE:
+                response = await self.es.search(index=self.page_index, **self._hash_query(business_id))
+                pages = self._hash_hits(response)
+            else:
+                doc = await self.es.get(index=self.index_name, id=business_id, source_includes=HASH_FIELDS)
+                pages = self._hash_pages(doc)
+        except NotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"Failed to fetch content hashes for businessID={business_id}: {e}")
+            if self.hash_index.load(business_id):
+                return
+        self.hash_index.prime(business_id, pages)
+
+    async def _next_batch(self):
+        """Wait for the first entry, then collect more until a batch limit or batch_max_age is reached"""
+        batch = [await self.queue.get()]
+        size = batch[0]['size']
+        deadline = time.monotonic() + self.batch_max_age
+        while len(batch) < self.batch_size and size < self.batch_bytes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            batch.append(entry)
+            size += entry['size']
+        return batch
+
+    async def _writer(self):
+        if self.layout == LAYOUT_PER_PAGE:
+            try:
+                if not await self.es.indices.exists(index=self.page_index):
+                    await self.es.indices.create(index=self.page_index, mappings=PAGE_INDEX_MAPPINGS)
+            except Exception as e:
+                self.logger.warning(f"Failed to create page index {self.page_index}: {e}")
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._bulk_write_async(batch)
+            except Exception as e:
+                self.logger.error(f"Error writing {len(batch)} items to ES: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _bulk_write_async(self, batch):
+        """Async counterpart of CsvPipeline._bulk_write"""
+        attempt = 0
+        pending = batch
+
+        while pending:
+            if not self.breaker.allow():
+                self._dead_letter(pending, "circuit breaker open")
+                return
+            processed = 0
+            retry = []
+            try:
+                results = async_streaming_bulk(
+                    self.es,
+                    [entry['action'] for entry in pending],
+                    chunk_size=len(pending),
+                    max_chunk_bytes=self.batch_bytes * 2,
+                    raise_on_error=False,
+                    request_timeout=60
+                )
+                pushed_back = False
+                async for ok, info in results:
+                    entry = pending[processed]
+                    processed += 1
+                    pushed_back |= self._check_result(entry, ok, info, retry)
+                if pushed_back:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                pending = retry
+                error = "retriable item failures"
+            except Exception as e:
+                self.breaker.record_failure()
+                pending = retry + pending[processed:]
+                error = str(e)
+            if pending:
+                attempt += 1
+                if attempt > self.max_retries:
+                    self._dead_letter(pending, error)
+                    return
+                delay = backoff_delay(attempt)
+                self.logger.warning(f" 写入ES失败，{delay:.1f}s 后重试 {len(pending)} 条 ({attempt}/{self.max_retries}): {error}")
+                await asyncio.sleep(delay)
+
+    async def close_spider(self, spider):
+        """Wait until everything queued is written, then stop the writer and close the client"""
+        if self.writer_task is not None:
+            await self.transform_queue.join()
+            await self.queue.join()
+            for task in [self.writer_task, *self.transform_tasks]:
+                task.cancel()
+            await asyncio.gather(self.writer_task, *self.transform_tasks, return_exceptions=True)
+        self.transform_pool.close()
+        await self.es.close()
+        self.logger.info(f"close pipeline!!! skipped {self.hash_index.skipped} unchanged pages, "
+                         f"spooled {self.dead_letters.spooled} failed writes")
+        self.hash_index.close()
@@ -0,0 +1,117 @@
+import asyncio
+import email.utils
+import time
+from urllib.parse import urlparse
+import global_vars
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or 0 if absent / invalid"""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class HostBucket:
+    """Token bucket of one host. ``rate`` drops when the host throttles us and creeps back afterwards."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_throttled = 0.0
+        self.last_recovered = 0.0
+        self.lock = asyncio.Lock()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class HostRateLimiter:
+    """Per-host politeness shared by every fetch path of a process (HTTP tier, Playwright, URL type checks).
+
+    Each host gets ``default_rate`` requests per second with bursts of ``burst``. A 429/503 cuts the
+    host's rate by ``backoff_factor`` and honours Retry-After; once the host has been quiet for
+    ``recovery_interval`` seconds every successful response raises the rate by ``recovery_factor``,
+    at most once per interval, until it is back at the default.
+    """
+
+    def __init__(self, default_rate: float = 2.0, burst: int = 4, min_rate: float = 0.05,
+                 backoff_factor: float = 0.5, recovery_factor: float = 1.25, recovery_interval: float = 30.0,
+                 max_retry_after: float = 300.0):
+        self.default_rate = default_rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.backoff_factor = backoff_factor
+        self.recovery_factor = recovery_factor
+        self.recovery_interval = recovery_interval
+        self.max_retry_after = max_retry_after
+        self.buckets = {}
+        self.throttled_responses = 0
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def bucket(self, url: str) -> HostBucket:
+        host = self.host_of(url)
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = HostBucket(self.default_rate, self.burst)
+        return bucket
+
+    async def acquire(self, url: str):
+        """Wait until a request to the host of ``url`` may be sent"""
+        bucket = self.bucket(url)
+        async with bucket.lock:  # 同一主机的请求按顺序领取令牌
+            while True:
+                now = time.monotonic()
+                if now < bucket.blocked_until:
+                    await asyncio.sleep(bucket.blocked_until - now)
+                    continue
+                bucket.refill(now)
+                if bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    return
+                await asyncio.sleep((1 - bucket.tokens) / bucket.rate)
+
+    def available(self, url: str) -> int:
+        """Whole tokens the host of ``url`` has right now without waiting; 0 while it is paused or has waiters"""
+        bucket = self.bucket(url)
+        now = time.monotonic()
+        if now < bucket.blocked_until or bucket.lock.locked():
+            return 0
+        bucket.refill(now)
+        return int(bucket.tokens)
+
+    def report(self, url: str, status: int, retry_after=None):
+        """Feed the response status of a request back into the host's rate"""
+        bucket = self.bucket(url)
+        now = time.monotonic()
+        if status in THROTTLE_STATUSES:
+            self.throttled_responses += 1
+            bucket.rate = max(self.min_rate, bucket.rate * self.backoff_factor)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            bucket.last_throttled = now
+            delay = min(parse_retry_after(retry_after), self.max_retry_after)
+            if delay:
+                bucket.blocked_until = max(bucket.blocked_until, now + delay)
+            global_vars.logger.info(f"Host {self.host_of(url)} answered {status}, rate lowered to {bucket.rate:.2f}/s"
+                                    f"{f', paused for {delay:.0f}s' if delay else ''}")
+        elif status and status < 500 and bucket.rate < self.default_rate:
+            if now - bucket.last_throttled >= self.recovery_interval and now - bucket.last_recovered >= self.recovery_interval:
+                bucket.rate = min(self.default_rate, bucket.rate * self.recovery_factor)
+                bucket.last_recovered = now
+                global_vars.logger.debug(f"Host {self.host_of(url)} recovering, rate raised to {bucket.rate:.2f}/s")
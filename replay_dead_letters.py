@@ -0,0 +1,58 @@
+import argparse
+import os
+import global_vars
+from elasticsearch import Elasticsearch, helpers
+from dead_letter import DeadLetterSpool
+from pipeline import RETRY_STATUSES
+
+
+def replay_file(es, spool: DeadLetterSpool, path: str, chunk_size: int) -> bool:
+    """Bulk-load one spool file. Actions that still fail with a retriable status go to a new spool
+    file; the replayed file is renamed to *.done. Returns False if ES was unreachable."""
+    actions = list(DeadLetterSpool.read(path))
+    ok_count, retry, dropped = 0, [], 0
+    try:
+        for action, (ok, info) in zip(actions, helpers.streaming_bulk(es, actions, chunk_size=chunk_size,
+                                                                     raise_on_error=False, request_timeout=60)):
+            if ok:
+                ok_count += 1
+                continue
+            result = next(iter(info.values()), {})
+            if result.get('status') in RETRY_STATUSES:
+                retry.append(action)
+            else:
+                dropped += 1
+                global_vars.logger.error(f"Dropping dead letter for _id={action.get('_id')}: {result.get('error')}")
+    except Exception as e:
+        global_vars.logger.error(f"Replay of {path} stopped, ES unavailable: {e}")
+        return False
+
+    os.rename(path, path + '.done')
+    if retry:
+        spool.write(retry)
+    global_vars.logger.info(f"Replayed {path}: {ok_count} written, {len(retry)} spooled again, {dropped} dropped")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load spooled ES writes back into Elasticsearch.')
+    parser.add_argument('--Config', required=True, type=str, help='Configuration file path')
+    parser.add_argument('--Dir', type=str, help='Dead letter directory (default: ES_DEAD_LETTER_DIR)')
+    parser.add_argument('--ChunkSize', type=int, default=200, help='Actions per bulk request')
+    args = parser.parse_args()
+
+    global_vars.init_globals(args.Config)
+    directory = args.Dir or global_vars.config.get("ES_DEAD_LETTER_DIR") or "data/dead_letter"
+    es = Elasticsearch(hosts=global_vars.config.get("ES_HOST"), api_key=global_vars.config.get("ES_API_KEY"))
+
+    # Snapshot the file list first, so re-spooled actions wait for the next replay
+    files = DeadLetterSpool.files(directory)
+    spool = DeadLetterSpool(directory)
+    global_vars.logger.info(f"Replaying {len(files)} dead letter files from {directory}")
+    for path in files:
+        if not replay_file(es, spool, path, args.ChunkSize):
+            break
+
+
+if __name__ == "__main__":
+    main()
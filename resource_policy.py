@@ -0,0 +1,119 @@
+import json
+from urllib.parse import urlparse
+import global_vars
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = ['image', 'media', 'font']
+
+# 常见的统计 / 广告 / 在线客服第三方域名
+DEFAULT_BLOCKED_HOSTS = [
+    # analytics
+    'google-analytics.com', 'googletagmanager.com', 'analytics.google.com', 'hotjar.com', 'clarity.ms',
+    'segment.com', 'segment.io', 'mixpanel.com', 'nr-data.net', 'newrelic.com', 'quantserve.com',
+    'scorecardresearch.com', 'hs-analytics.net', 'fullstory.com', 'mouseflow.com', 'crazyegg.com',
+    # ads
+    'doubleclick.net', 'googlesyndication.com', 'googleadservices.com', 'adservice.google.com',
+    'amazon-adsystem.com', 'taboola.com', 'outbrain.com', 'adnxs.com', 'facebook.net',
+    # chat widgets
+    'intercom.io', 'intercomcdn.com', 'drift.com', 'driftt.com', 'zopim.com', 'zdassets.com',
+    'tawk.to', 'livechatinc.com', 'crisp.chat', 'olark.com', 'tidio.co', 'podium.com',
+]
+
+
+def host_matches(host: str, suffixes) -> str:
+    """Return the suffix ``host`` equals or is a subdomain of, or an empty string"""
+    for suffix in suffixes:
+        if host == suffix or host.endswith('.' + suffix):
+            return suffix
+    return ''
+
+
+class BlockStats:
+    def __init__(self):
+        self.blocked_requests = 0
+        self.blocked_by_type = {}
+        self.blocked_by_host = {}
+        self.allowed_requests = 0
+        self.allowed_bytes = 0  # Content-Length of the subresources we let through
+
+    def record_blocked(self, resource_type: str, host: str):
+        self.blocked_requests += 1
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+        self.blocked_by_host[host] = self.blocked_by_host.get(host, 0) + 1
+
+    def __repr__(self):
+        top_hosts = sorted(self.blocked_by_host.items(), key=lambda kv: kv[1], reverse=True)[:10]
+        return (f"blocked={self.blocked_requests} by_type={self.blocked_by_type} top_hosts={dict(top_hosts)}, "
+                f"allowed={self.allowed_requests} allowed_bytes={self.allowed_bytes}")
+
+
+class ResourcePolicy:
+    """Decides which subresources a Playwright page may load.
+
+    Blocks the configured resource types and requests to known third-party analytics, ads and chat
+    hosts. ``allowlists`` maps a site domain to the ``resource_types`` and ``hosts`` it still needs,
+    e.g. a site whose content is rendered by a blocked widget. Navigation requests are never blocked.
+    """
+
+    def __init__(self, blocked_resource_types=None, blocked_hosts=None, allowlists: dict = None):
+        self.blocked_resource_types = set(DEFAULT_BLOCKED_RESOURCE_TYPES if blocked_resource_types is None else blocked_resource_types)
+        self.blocked_hosts = list(DEFAULT_BLOCKED_HOSTS if blocked_hosts is None else blocked_hosts)
+        self.allowlists = allowlists or {}
+        self.stats = BlockStats()
+
+    @classmethod
+    def from_file(cls, path: str) -> 'ResourcePolicy':
+        """Load a policy from JSON with optional keys blocked_resource_types, blocked_hosts and allowlists"""
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config.get('blocked_resource_types'), config.get('blocked_hosts'), config.get('allowlists'))
+
+    def _allowlist(self, site_domain: str) -> dict:
+        allowlist_domain = host_matches(site_domain, self.allowlists.keys())
+        return self.allowlists.get(allowlist_domain, {}) if allowlist_domain else {}
+
+    def block_reason(self, request_url: str, resource_type: str, site_domain: str) -> str:
+        """Why a request should be blocked, or an empty string to let it through"""
+        host = urlparse(request_url).netloc.lower().split(':')[0]
+        allowlist = self._allowlist(site_domain)
+        if resource_type in self.blocked_resource_types and resource_type not in allowlist.get('resource_types', []):
+            return resource_type
+        blocked_host = host_matches(host, self.blocked_hosts)
+        if blocked_host and not host_matches(host, allowlist.get('hosts', [])) and not host_matches(host, [site_domain]):
+            return blocked_host
+        return ''
+
+    async def install(self, page, site_url: str):
+        """Route every request of ``page`` through the policy. Returns the handlers to pass to ``uninstall``."""
+        site_domain = urlparse(site_url).netloc.lower().split(':')[0]
+        if site_domain.startswith('www.'):
+            site_domain = site_domain[4:]
+
+        async def route_handler(route):
+            request = route.request
+            try:
+                if not request.is_navigation_request():
+                    reason = self.block_reason(request.url, request.resource_type, site_domain)
+                    if reason:
+                        self.stats.record_blocked(request.resource_type, urlparse(request.url).netloc)
+                        global_vars.logger.debug(f"Blocked {request.resource_type} request ({reason}): {request.url}")
+                        await route.abort()
+                        return
+                await route.continue_()
+            except Exception as e:
+                global_vars.logger.debug(f"Route handling failed for {request.url}: {e}")
+
+        def on_response(response):
+            self.stats.allowed_requests += 1
+            try:
+                self.stats.allowed_bytes += int(response.headers.get('content-length', 0))
+            except ValueError:
+                pass
+
+        await page.route("**/*", route_handler)
+        page.on("response", on_response)
+        return route_handler, on_response
+
+    async def uninstall(self, page, handlers):
+        route_handler, on_response = handlers
+        page.remove_listener("response", on_response)
+        await page.unroute("**/*", route_handler)
@@ -4,13 +4,16 @@ from scrapy.linkextractors import LinkExtractor
 from scrapy.utils.url import canonicalize_url
 from bs4 import BeautifulSoup
 import logging
-from typing import List, Set, Dict, Optional
+from typing import List, Set, Dict, Optional, Tuple
 from scrapy.linkextractors.lxmlhtml import LxmlLinkExtractor
 from scrapy.http import TextResponse
+from parsed_page import LINK_DENY_EXTENSIONS, ParsedPage
+from link_classifier import LinkClassifier
+from url_type_checker import URLType, URLTypeChecker
 
 
 class AsyncLinkExtractor:
-    def __init__(self):
+    def __init__(self, classifier: LinkClassifier = None):
         # Initialize Scrapy's LinkExtractor with appropriate settings
         self.link_extractor = LinkExtractor(
             deny_extensions=[
@@ -26,6 +29,7 @@ class AsyncLinkExtractor:
             'jpg', 'jpeg', 'png', 'gif', 'mp3', 'mp4',
             'avi', 'mov', 'ics', 'ical'
         ]
+        self.classifier = classifier or LinkClassifier()
 
     def myurlparse(self, url: str) -> Optional[str]:
         """解析URL，返回域名或None"""
@@ -45,20 +49,23 @@ class AsyncLinkExtractor:
             return False
         return domain1 == domain2 or domain1.endswith(f".{domain2}") or domain2.endswith(f".{domain1}")
 
-    async def extract_links(self, scrapy_like_response: TextResponse, base_url: str) -> List[str]:
-        """Extract links from HTML using Scrapy's LinkExtractor"""
-        # Parse HTML with BeautifulSoup first to get proper HTML structure
-        link_extractor = LxmlLinkExtractor(unique=True)     
-        links = link_extractor.extract_links(scrapy_like_response)
+    async def extract_links(self, scrapy_like_response, base_url: str) -> List[str]:
+        """Extract links using Scrapy's LinkExtractor. Pass a ParsedPage to reuse the links it
+        already extracted from its tree instead of a TextResponse."""
+        if isinstance(scrapy_like_response, ParsedPage):
+            links = scrapy_like_response.links
+        else:
+            link_extractor = LxmlLinkExtractor(unique=True, deny_extensions=LINK_DENY_EXTENSIONS)
+            links = link_extractor.extract_links(scrapy_like_response)
 
         
         # Filter links to only include same domain or subdomains
-        extracted_urls = set()  # 使用集合来去重
+        extracted_urls = {}  # 有序字典去重, 保持链接在页面中的顺序
         for link in links:
             absolute_url = urljoin(base_url, link.url)
             
             if "docs.google.com/forms" in absolute_url:
-                extracted_urls.add(absolute_url)
+                extracted_urls[absolute_url] = None
                 continue
 
             # 检查协议和子域名
@@ -75,9 +82,14 @@ class AsyncLinkExtractor:
                         is_ok = False
                         break
                 if is_ok:
-                    extracted_urls.add(absolute_url)
+                    extracted_urls[absolute_url] = None
 
-        return list(extracted_urls)  # 返回列表
+        return list(extracted_urls)  # 返回列表, 按页面中出现的顺序
+
+    async def classify_links(self, urls: List[str], url_type_checker: URLTypeChecker = None) -> Tuple[List[str], Dict[str, URLType]]:
+        """Split extracted links into (page urls, {document url: URLType}), so documents can skip the
+        page frontier. Ambiguous links are HEAD-probed with ``url_type_checker`` when one is given."""
+        return await self.classifier.classify(urls, url_type_checker)
 
 
 async def main():
@@ -0,0 +1,38 @@
+import xxhash
+from w3lib.url import canonicalize_url
+
+
+def canonicalize(url: str) -> str:
+    """Canonical form used for deduplication: sorted query, no fragment, no leading/trailing slashes"""
+    return canonicalize_url(url.strip().strip('/'))
+
+
+def url_fingerprint(url: str) -> int:
+    """64-bit fingerprint of the canonical URL"""
+    return xxhash.xxh64_intdigest(canonicalize(url))
+
+
+class FingerprintSet:
+    """Set of URLs stored as 64-bit integer fingerprints instead of strings"""
+
+    def __init__(self, urls=()):
+        self.fingerprints = set()
+        for url in urls:
+            self.add(url)
+
+    def add(self, url: str) -> bool:
+        """Add ``url``; returns True if it was not in the set yet"""
+        return self.add_fingerprint(url_fingerprint(url))
+
+    def add_fingerprint(self, fingerprint: int) -> bool:
+        if fingerprint in self.fingerprints:
+            return False
+        self.fingerprints.add(fingerprint)
+        return True
+
+    def __contains__(self, url) -> bool:
+        """``url`` is a URL string or a fingerprint already computed with url_fingerprint"""
+        return (url if isinstance(url, int) else url_fingerprint(url)) in self.fingerprints
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
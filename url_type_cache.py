@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+import global_vars
+from crawl_journal import to_signed
+from url_fingerprint import url_fingerprint
+from url_type_checker import URLInfo, URLType
+
+
+class URLTypeCache:
+    """Bounded LRU cache of URLTypeChecker results: URL -> (type, final URL, title, status).
+
+    One instance per process, shared by every site the process crawls. Entries expire after
+    ``ttl`` seconds; errors only live ``error_ttl`` seconds in memory and 429s are never cached.
+    With ``path`` successful results are also kept in SQLite, so other processes and later runs
+    skip the probe too. Keys are URL fingerprints. An entry probed without the title does not
+    answer a lookup that needs it.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = 50000, ttl: float = 7 * 24 * 3600, error_ttl: float = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.entries = OrderedDict()  # fingerprint -> (expires_at, URLInfo, has_title)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS url_types (
+                    fp INTEGER PRIMARY KEY,
+                    url_type INTEGER NOT NULL,
+                    final_url TEXT,
+                    title TEXT,
+                    status INTEGER,
+                    has_title INTEGER NOT NULL,
+                    checked_at REAL NOT NULL
+                )
+            """)
+            self.conn.commit()
+
+    def get(self, url: str, with_title: bool = True) -> Optional[URLInfo]:
+        fingerprint = url_fingerprint(url)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(fingerprint)
+            if entry is not None:
+                expires_at, info, has_title = entry
+                if expires_at <= now:
+                    del self.entries[fingerprint]
+                elif has_title or not with_title or info.url_type != URLType.HTML:
+                    self.entries.move_to_end(fingerprint)
+                    self.hits += 1
+                    return info
+            info = self._load(fingerprint, now, with_title)
+            if info is not None:
+                self.disk_hits += 1
+                return info
+            self.misses += 1
+            return None
+
+    def _load(self, fingerprint: int, now: float, with_title: bool) -> Optional[URLInfo]:
+        if self.conn is None:
+            return None
+        try:
+            row = self.conn.execute("SELECT url_type, final_url, title, status, has_title, checked_at FROM url_types WHERE fp = ?",
+                                    (to_signed(fingerprint),)).fetchone()
+        except Exception as e:
+            global_vars.logger.error(f"Error reading URL type cache: {e}")
+            return None
+        if row is None or row[5] + self.ttl <= now:
+            return None
+        info = URLInfo(URLType(row[0]), title=row[2], url=row[1], status=row[3])
+        has_title = bool(row[4])
+        if with_title and not has_title and info.url_type == URLType.HTML:
+            return None
+        self._remember(fingerprint, row[5] + self.ttl, info, has_title)
+        return info
+
+    def _remember(self, fingerprint: int, expires_at: float, info: URLInfo, has_title: bool):
+        self.entries[fingerprint] = (expires_at, info, has_title)
+        self.entries.move_to_end(fingerprint)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def put(self, url: str, info: URLInfo, with_title: bool = True):
+        """Cache a check result under the URL and, after a redirect, under the final URL too"""
+        if info.status == 429:
+            return
+        now = time.time()
+        failed = info.url_type == URLType.ERROR
+        urls = [url] if failed or not info.url or info.url == url else [url, info.url]
+        with self.lock:
+            for cached_url in urls:
+                fingerprint = url_fingerprint(cached_url)
+                self._remember(fingerprint, now + (self.error_ttl if failed else self.ttl), info, with_title)
+                if self.conn is None or failed:
+                    continue
+                try:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO url_types (fp, url_type, final_url, title, status, has_title, checked_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (to_signed(fingerprint), info.url_type.value, info.url, info.title, info.status, int(with_title), now))
+                except Exception as e:
+                    global_vars.logger.error(f"Error saving URL type of {cached_url}: {e}")
+            if self.conn is not None and not failed:
+                try:
+                    self.conn.commit()
+                except Exception as e:
+                    global_vars.logger.error(f"Error committing URL type cache: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            'entries': len(self.entries),
+        }
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
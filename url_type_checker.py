@@ -4,17 +4,16 @@ from concurrent.futures import ThreadPoolExecutor
 from playwright.async_api import async_playwright
 from urllib.parse import urlparse, urljoin
 from typing import List, Set, Dict, Optional
+import html
 import logging
+import re
 import threading
 import time
-from bs4 import BeautifulSoup
-import asyncio
-import logging
-import requests
 from link_extractor import LinkExtractor
 
 from enum import Enum
 import global_vars
+from rate_limiter import HostRateLimiter
 class URLType(Enum):
     HTML = 0
     PDF = 1
@@ -22,110 +21,169 @@ class URLType(Enum):
     OTHER = 3
     ERROR = -1
 
+TITLE_PATTERN = re.compile(r'<title[^>]*>(.*?)</title\s*>', re.I | re.S)
+TITLE_END = re.compile(rb'</title\s*>', re.I)
+# HEAD 不被支持 / 被拒绝时改用 GET
+HEAD_FALLBACK_STATUSES = (403, 405, 501)
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
 class URLInfo:
-    def __init__(self, url_type: URLType, title: str = None, response: requests.Response = None):
+    def __init__(self, url_type: URLType, title: str = None, url: str = None, status: int = None):
         self.url_type = url_type
         self.title = title
-        self.response = response
+        self.url = url  # 跟随重定向后的最终 URL
+        self.status = status
 
     def __repr__(self):
-        return f"URLInfo(type={self.url_type}, title='{self.title}')"
+        return f"URLInfo(type={self.url_type}, title='{self.title}', url='{self.url}', status={self.status})"
 
-class URLTypeChecker:
 
-    async def is_pdf_url_with_title(self, url: str, max_retries: int = 5, retry_delay: int = 2) -> URLInfo:
+def type_from_content_type(content_type: str) -> URLType:
+    content_type = content_type.lower()
+    if 'text/html' in content_type or 'application/xhtml' in content_type:
+        return URLType.HTML
+    if 'application/pdf' in content_type:
+        return URLType.PDF
+    if DOCX_CONTENT_TYPE in content_type:
+        return URLType.DOCX
+    return URLType.OTHER
+
+
+class URLTypeChecker:
+    """Classifies a URL as HTML / PDF / DOCX / OTHER without downloading it.
+
+    Uses the process's aiohttp session (one connection pool shared with the HTTP tier). A HEAD
+    request decides the type; servers that reject HEAD get a ranged GET instead. For HTML the
+    title is read from at most ``max_title_bytes`` of the body, stopping at ``</title>``.
+    With a ``cache`` (url_type_cache.URLTypeCache) repeated checks of a URL skip the network.
+    """
+
+    def __init__(self, rate_limiter: HostRateLimiter = None, session: aiohttp.ClientSession = None,
+                 timeout: int = 5, max_title_bytes: int = 64 * 1024, cache=None):
+        # 与爬虫共享的按主机限速器，没有时退回到固定的重试间隔
+        self.rate_limiter = rate_limiter
+        # 与爬虫共享的连接池；没有时第一次请求时自建一个，由 close() 关闭
+        self.session = session
+        self._own_session = None
+        self.timeout = timeout
+        self.max_title_bytes = max_title_bytes
+        self.cache = cache
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36',
+            'Accept': 'text/html,application/pdf,*/*;q=0.9',  # 明确声明可以接受 PDF
+        }
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.session is not None and not self.session.closed:
+            return self.session
+        if self._own_session is None or self._own_session.closed:
+            self._own_session = aiohttp.ClientSession()
+        return self._own_session
+
+    async def close(self):
+        if self._own_session is not None and not self._own_session.closed:
+            await self._own_session.close()
+
+    async def _request(self, method: str, url: str, headers: dict):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(url)
+        return self._session().request(method, url, headers=headers, allow_redirects=True, ssl=False,
+                                       timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def _read_title(self, response: aiohttp.ClientResponse) -> Optional[str]:
+        """Read the body only until </title> or max_title_bytes, whichever comes first"""
+        body = b''
+        async for chunk in response.content.iter_chunked(8192):
+            body += chunk
+            if TITLE_END.search(body, max(0, len(body) - len(chunk) - 16)) or len(body) >= self.max_title_bytes:
+                break
+        text = body[:self.max_title_bytes].decode(response.charset or 'utf-8', errors='replace')
+        match = TITLE_PATTERN.search(text)
+        return html.unescape(match.group(1)).strip() if match else None
+
+    def _report(self, url: str, response: aiohttp.ClientResponse):
+        if self.rate_limiter is not None:
+            self.rate_limiter.report(url, response.status, response.headers.get('Retry-After'))
+
+    async def _check(self, url: str, with_title: bool = True) -> URLInfo:
+        """One HEAD (+ ranged GET when needed) round. Returns URLInfo with status 429 when throttled."""
+        async with await self._request('HEAD', url, self.headers) as response:
+            self._report(url, response)
+            status, final_url = response.status, str(response.url)
+            content_type = response.headers.get('Content-Type', '')
+        if status == 429:
+            return URLInfo(URLType.ERROR, url=final_url, status=status)
+        if status < 400 and content_type:
+            url_type = type_from_content_type(content_type)
+            if url_type != URLType.HTML or not with_title:
+                return URLInfo(url_type, url=final_url, status=status)
+        elif status >= 400 and status not in HEAD_FALLBACK_STATUSES:
+            global_vars.logger.error(f"HTTP error checking {url}: status {status}")
+            return URLInfo(URLType.ERROR, url=final_url, status=status)
+
+        # HTML 需要标题, 或者 HEAD 没有给出类型: 只请求开头的一段
+        headers = {**self.headers, 'Range': f'bytes=0-{self.max_title_bytes - 1}'}
+        async with await self._request('GET', url, headers) as response:
+            self._report(url, response)
+            status, final_url = response.status, str(response.url)
+            if status == 429:
+                return URLInfo(URLType.ERROR, url=final_url, status=status)
+            if status >= 400:
+                global_vars.logger.error(f"HTTP error checking {url}: status {status}")
+                return URLInfo(URLType.ERROR, url=final_url, status=status)
+            url_type = type_from_content_type(response.headers.get('Content-Type', ''))
+            title = await self._read_title(response) if url_type == URLType.HTML and with_title else None
+        return URLInfo(url_type, title=title, url=final_url, status=status)
+
+    async def is_pdf_url_with_title(self, url: str, max_retries: int = 5, retry_delay: int = 2,
+                                    with_title: bool = True) -> URLInfo:
         """Checks if a URL points to a PDF or HTML page, and returns the URLType and title (if HTML).
-        Handles retries for 429 errors.
+        Handles retries for 429 errors. Without ``with_title`` only the type is probed (HEAD alone when the server supports it).
         """
-
+        # 先检查 URL 后缀（快速判断，避免网络请求）
+        url_lower = url.lower()
+        if url_lower.endswith('.pdf'):
+            return URLInfo(URLType.PDF, url=url)  # No title for PDF
+        if url_lower.endswith('.docx'):
+            return URLInfo(URLType.DOCX, url=url)  # No title for DOCX
+
+        if self.cache is not None:
+            url_info = self.cache.get(url, with_title)
+            if url_info is not None:
+                return url_info
+        url_info = await self._check_with_retries(url, max_retries, retry_delay, with_title)
+        if self.cache is not None:
+            self.cache.put(url, url_info, with_title)
+        return url_info
+
+    async def _check_with_retries(self, url: str, max_retries: int, retry_delay: int, with_title: bool) -> URLInfo:
         for attempt in range(max_retries):
             try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36',
-                    'Accept': 'text/html,application/pdf,*/*;q=0.9',  # 明确声明可以接受 PDF
-                }
-                # 先检查 URL 后缀（快速判断，避免网络请求）
-                url_lower = url.lower()
-                if url_lower.endswith('.pdf'):
-                    return URLInfo(URLType.PDF)  # No title for PDF
-                if url_lower.endswith('.docx'):
-                    return URLInfo(URLType.DOCX)  # No title for DOCX
-
-                # 发送  请求（只获取头部，stream=True 避免下载内容）
-                response = requests.get(  # 使用 GET 请求 to get content for title
-                    url,
-                    headers=headers,
-                    stream=True,  # initially, don't download the content
-                    allow_redirects=True,
-                    timeout=5,
-                )
-
-                # 确保 HTTP 请求成功
-                response.raise_for_status()
-
-                # 获取 Content-Type
-                content_type = response.headers.get('Content-Type', '').lower()
-
-                # 检查是否是 PDF
-                if 'text/html' in content_type:
-                    # Get the title
-                    response.raw.decode_content = True  # Handle gzipped content
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    title = soup.title.string if soup.title else None
-                    response.close()
-                    return URLInfo(URLType.HTML, title=title)
-                elif 'application/pdf' in content_type:
-                    response.close()
-                    return URLInfo(URLType.PDF)
-                elif 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' in content_type:
-                    response.close()
-                    return URLInfo(URLType.DOCX)
-                else:
-                    response.close()
-                    return URLInfo(URLType.OTHER)  # Likely a webpage or HTML content
-
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:
-                    global_vars.logger.info(f"Received 429 error for {url}, retrying in {retry_delay} seconds (attempt {attempt + 1}/{max_retries})")
-                    if attempt < max_retries - 1: # Only sleep if there are retries left
-                        await asyncio.sleep(retry_delay)
-                        continue
-                    else:
-                        global_vars.logger.error(f"Max retries reached for {url} after receiving 429 errors.  Returning ERROR.")
-                        return URLInfo(URLType.ERROR) # Give up after max retries
-
-                else:
-                    global_vars.logger.error(f"HTTP error checking {url}: {e}")
-                    return URLInfo(URLType.ERROR)
-
-            except requests.exceptions.RequestException as e:
-                global_vars.logger.error(f"Error checking {url}: {e}")  # 调试信息（可选）
-                return URLInfo(URLType.ERROR)
-
-
+                url_info = await self._check(url, with_title)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                global_vars.logger.error(f"Error checking {url}: {e!r}")
+                return URLInfo(URLType.ERROR, url=url)
             except Exception as e:
-                global_vars.logger.error(f"Unexpected error checking {url}: {e}")
-                return URLInfo(URLType.ERROR)
+                global_vars.logger.error(f"Unexpected error checking {url}: {e!r}")
+                return URLInfo(URLType.ERROR, url=url)
 
-            finally:
-                # Ensure the response is closed, even in case of errors
-                if 'response' in locals():  # Check if the variable exists
-                    try:
-                        response.close()
-                    except Exception as e:
-                        global_vars.logger.error(f"Error closing response for {url}: {e}")
-            # If the request was successful (no exceptions raised), exit the loop
-            break
+            if url_info.status != 429:
+                return url_info
+            global_vars.logger.info(f"Received 429 error for {url}, retrying in {retry_delay} seconds (attempt {attempt + 1}/{max_retries})")
+            if attempt < max_retries - 1 and self.rate_limiter is None:  # otherwise the rate limiter has backed off and paces the retry
+                await asyncio.sleep(retry_delay)
 
-        return URLInfo(URLType.ERROR)  # Should not reach here if successful on first try, or retries are exhausted due to 429.
+        global_vars.logger.error(f"Max retries reached for {url} after receiving 429 errors.  Returning ERROR.")
+        return URLInfo(URLType.ERROR, url=url, status=429)
 
 async def main():
     base_url = "http://www.centerstagenj.co"
     extractor = URLTypeChecker()
     url_info = await extractor.is_pdf_url_with_title(base_url)
-    print(base_url, url_info.response.url)
+    print(base_url, url_info.url, url_info)
+    await extractor.close()
 
 
 if __name__ == "__main__":
     global_vars.init_globals("/root/ai_crawl/config.env")
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
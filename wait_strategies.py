@@ -0,0 +1,114 @@
+import asyncio
+import time
+import global_vars
+
+
+class WaitMetrics:
+    """How long pages waited under one strategy and how often the hard cap was hit"""
+
+    def __init__(self):
+        self.pages = 0
+        self.settled = 0
+        self.capped = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited: float, settled: bool):
+        self.pages += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if settled:
+            self.settled += 1
+        else:
+            self.capped += 1
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.pages if self.pages else 0.0
+
+    def __repr__(self):
+        return (f"pages={self.pages}, settled={self.settled}, capped={self.capped}, "
+                f"avg={self.average_wait:.2f}s, max={self.max_wait:.2f}s")
+
+
+class WaitStrategy:
+    """Decides when a page that fired 'load' is ready to be read.
+
+    ``wait`` returns True when the page settled and False when the hard cap was hit. Content is
+    re-read after the wait when the page settled, or always if ``content_on_timeout`` is set.
+    """
+    name = 'load'
+    content_on_timeout = False
+
+    def __init__(self, max_wait: float = 10):
+        self.max_wait = max_wait
+        self.metrics = WaitMetrics()
+
+    async def wait(self, page) -> bool:
+        start_time = time.time()
+        try:
+            settled = await self._wait(page)
+        except Exception as e:
+            global_vars.logger.debug(f"'{self.name}' wait failed for {page.url}: {e}")
+            settled = False
+        waited = time.time() - start_time
+        self.metrics.record(waited, settled)
+        global_vars.logger.debug(f"'{self.name}' wait for {page.url}: settled={settled} after {waited:.2f}s")
+        return settled
+
+    async def _wait(self, page) -> bool:
+        return True
+
+
+class NetworkIdleWait(WaitStrategy):
+    """Playwright's networkidle: no requests for 500ms. Never fires on pages with beacons or long polling."""
+    name = 'networkidle'
+
+    async def _wait(self, page) -> bool:
+        await page.wait_for_load_state('networkidle', timeout=self.max_wait * 1000)
+        return True
+
+
+class DomStabilityWait(WaitStrategy):
+    """Return once the DOM stopped changing: no mutations and an unchanged text length for ``stable_window`` seconds."""
+    name = 'dom_stable'
+    content_on_timeout = True
+
+    # 在页面中安装 MutationObserver，返回 [变更次数, 文本长度]
+    PROBE_SCRIPT = """
+        () => {
+            if (window.__crawlMutations === undefined) {
+                window.__crawlMutations = 0;
+                new MutationObserver(records => { window.__crawlMutations += records.length; })
+                    .observe(document, {childList: true, subtree: true, characterData: true});
+            }
+            return [window.__crawlMutations, document.body ? document.body.textContent.length : 0];
+        }
+    """
+
+    def __init__(self, max_wait: float = 10, stable_window: float = 0.5, poll_interval: float = 0.1):
+        super().__init__(max_wait)
+        self.stable_window = stable_window
+        self.poll_interval = poll_interval
+
+    async def _wait(self, page) -> bool:
+        deadline = time.time() + self.max_wait
+        last_state = await page.evaluate(self.PROBE_SCRIPT)
+        stable_since = time.time()
+        while time.time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            state = await page.evaluate(self.PROBE_SCRIPT)
+            if state != last_state:
+                last_state = state
+                stable_since = time.time()
+            elif time.time() - stable_since >= self.stable_window:
+                return True
+        return False
+
+
+WAIT_STRATEGIES = {strategy.name: strategy for strategy in [WaitStrategy, NetworkIdleWait, DomStabilityWait]}
+
+
+def build_wait_strategies(max_wait: float) -> dict:
+    """One instance of every strategy, keyed by name, so their metrics accumulate per process"""
+    return {name: strategy(max_wait=max_wait) for name, strategy in WAIT_STRATEGIES.items()}